@@ -0,0 +1,34 @@
+import time
+from MCTSPlayer import BaseMCTSPlayer, Node
+from playout import EvalPlayout
+
+class MCTSDLPlayer(BaseMCTSPlayer):
+  """
+  MCTS player with depth limited rollouts, which stop after some turns and guess the winner
+    with EvalPlayout's static evaluation
+  """
+  name = "MCTSDLPlayer"
+  # Takes 3 arguments, the two of BaseMCTSPlayer and:
+  argcount = 3
+  #   3) The number of turns to play in each random game before evaluating it
+  turns: int
+  argnames = ["execTime", "rollout", "turns"]
+  playout: EvalPlayout
+
+  def __init__(self, *args) -> None:
+    super().__init__(*args)
+    self.turns = int(args[2])
+    self.playout = EvalPlayout() # type: ignore
+
+  def simulate(self, node: Node):
+    """
+    Simulate a node by running short random games, the reward is between -1 and 1 for each depending on the chance of winning
+    """
+    reward = 0
+    startTime = time.perf_counter()
+    boardState = self.position(node)
+    for _ in range(self.rollout):
+      self.stats.rollouts += 1
+      reward += 2 * self.playout.play_eval(boardState, self.color, self.turns) - 1
+    self.stats.rolloutTime += time.perf_counter() - startTime
+    return reward
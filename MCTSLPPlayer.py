@@ -0,0 +1,76 @@
+import multiprocessing
+import random
+import time
+import weakref
+from MCTSPlayer import BaseMCTSPlayer, Node, BatchBoard
+from playout import Playout
+
+# Each worker process keeps its own engines between jobs
+_playout: Playout | None = None
+_batch = None
+
+def play_rollouts(args: tuple[bytes, int, int, int]) -> int:
+  """
+  Play a number of random games from a position in a worker, and return how many a color won
+  """
+  global _playout, _batch
+  boardState, count, color, seed = args
+  # The workers are copies of the same process, so without a seed they would all play the same games
+  random.seed(seed)
+  if BatchBoard != None and count >= BaseMCTSPlayer.batchRollouts:
+    if _batch == None:
+      _batch = BatchBoard()
+    return int((_batch.play([boardState] * count) == color).sum())
+  if _playout == None:
+    _playout = Playout()
+  wins = 0
+  for _ in range(count):
+    if _playout.play(boardState) == color:
+      wins += 1
+  return wins
+
+class MCTSLPPlayer(BaseMCTSPlayer):
+  """
+  Leaf parallel MCTS player, the rollouts of each leaf are split between worker processes
+    Only worth it when there are many rollouts per leaf, since every leaf waits for all the workers
+  """
+  name = "MCTSLPPlayer"
+  # Takes 3 arguments, the two of BaseMCTSPlayer and:
+  argcount = 3
+  #   3) The number of worker processes to play the rollouts with
+  workers: int
+  argnames = ["execTime", "rollout", "workers"]
+
+  def __init__(self, *args) -> None:
+    super().__init__(*args)
+    self.workers = int(args[2])
+    self._pool = None
+    self._closePool = None
+
+  def simulate(self, node: Node):
+    startTime = time.perf_counter()
+    # The pool is kept for the whole game, since starting processes is slow
+    if self._pool == None:
+      self._pool = multiprocessing.Pool(self.workers)
+      # Shut the workers down when the player is freed or the program exits
+      self._closePool = weakref.finalize(self, self._pool.terminate)
+    boardState = self.position(node)
+    jobs = []
+    for i in range(self.workers):
+      count = self.rollout // self.workers + (1 if i < self.rollout % self.workers else 0)
+      if count > 0:
+        jobs.append((boardState, count, self.color, random.getrandbits(32)))
+    wins = sum(self._pool.map(play_rollouts, jobs))
+    self.stats.rollouts += self.rollout
+    self.stats.rolloutTime += time.perf_counter() - startTime
+    # 1 for each win and -1 for each loss
+    return 2 * wins - self.rollout
+
+  def close(self):
+    """
+    Shut down the worker processes, they are started again if the player simulates again
+    """
+    if self._closePool != None:
+      self._closePool()
+      self._pool = None
+      self._closePool = None
@@ -11,6 +11,6 @@ class MCTSMBPlayer(MCTSSolverPlayer):
   subset = 1
 
   def check_children(self, node: Node, val: int) -> bool:
-    self.board.decode(node.boardState)
+    self.load(self.position(node))
     result = minimax_internal(self.board, self.depth, self.color, self.subset, inf, -inf)
     return result == val
@@ -1,3 +1,4 @@
+import time
 from MCTSPlayer import BaseMCTSPlayer, Node
 from minimax_moves import minimax
 
@@ -12,11 +13,12 @@ class MCTSMRPlayer(BaseMCTSPlayer):
     Simulate a node by running random games and tracking who wins
     """
     reward = 0
+    startTime = time.perf_counter()
     for _ in range(self.rollout):
       self.stats.rollouts += 1
-      self.board.decode(node.boardState)
+      self.load(self.position(node))
       while not self.board.state.end:
-        self.board.do_move(minimax(self.board, self.depth, self.board.state.player, self.subset))
+        self.board.apply_move(minimax(self.board, self.depth, self.board.state.player, self.subset))
 
       if self.board.state.player == self.color:
         # If we win, the reward is 1
@@ -24,5 +26,6 @@ class MCTSMRPlayer(BaseMCTSPlayer):
       else:
         # If we lose, the "reward" is -1
         reward -= 1
+    self.stats.rolloutTime += time.perf_counter() - startTime
     
     return reward
@@ -19,14 +19,14 @@ class MCTSMSPlayer(MCTSSolverPlayer):
       self.stats.explored += 1
       if len(node.children) == 0:
         return path
-      for child in node.children:
-        if len(child.children) == 0:
+      for i, child in enumerate(node.children):
+        if child == None or len(child.children) == 0:
           self.stats.explored += 1
-          path.append(child)
+          path.append(self.child(node, i))
           return path
       if node.N >= self.visitThreshold:
-        for child in node.children:
-          self.board.decode(child.boardState)
+        for child in node.made_children():
+          self.load(self.position(child))
           value = minimax_internal(self.board, self.depth, self.color, self.subset, inff, -inff)
           if value == inff:
             self.stats.explored += 1
@@ -38,4 +38,4 @@ class MCTSMSPlayer(MCTSSolverPlayer):
             child.Q = -infi
             path.append(child)
             return path
-      node = max(node.children, key=self.uct)
+      node = max(node.made_children(), key=self.uct)
@@ -0,0 +1,66 @@
+import math
+from array import array
+from board import STEPS, RANKS
+from MCTSPlayer import BaseMCTSPlayer, Node, END_TURN
+
+class MCTSPWPlayer(BaseMCTSPlayer):
+  """
+  MCTS player with progressive widening, a node only considers its first few children
+    and more are allowed as it is visited more, in the order of a cheap prior
+  """
+  name = "MCTSPWPlayer"
+  # A node with N visits considers its first ceil(widenC * (N + 1) ** widenAlpha) children
+  widenC = 1
+  widenAlpha = 0.5
+
+  def expand(self, node: Node):
+    if len(node.children) > 0:
+      return
+    super().expand(node)
+    # The board is still at the node's position after expanding
+    node.steps = array("h", sorted(node.steps, key=self.prior, reverse=True))
+
+  def prior(self, step: int) -> int:
+    """
+    How promising a step looks, without looking further than the step itself
+      Ending the turn first so it is always allowed, then pushes and pulls, then rabbits moving towards their goal,
+      then everything else
+    """
+    if step == END_TURN:
+      return 3
+    s = STEPS[step]
+    if s.length == 2: # type: ignore
+      return 2
+    piece = self.board._data[s.oldSq] # type: ignore
+    if piece != None and piece & 7 == RANKS.RABBIT:
+      # Gold's rabbits move towards the first row and silver's towards the last
+      forward = (s.newSq >> 3) - (s.oldSq >> 3) # type: ignore
+      if forward == (-1 if piece >> 3 == 0 else 1):
+        return 1
+    return 0
+
+  def allowed(self, node: Node) -> int:
+    """
+    The number of children a node is allowed to consider
+    """
+    return min(len(node.children), math.ceil(self.widenC * (node.N + 1) ** self.widenAlpha))
+
+  def select(self, node: Node):
+    """
+    Select a node to explore this iteration, by choosing children by uct until we find an unexplored node,
+      only looking at the children the node is allowed to consider
+    """
+    path = []
+    while True:
+      path.append(node)
+      self.stats.explored += 1
+      if len(node.children) == 0:
+        return path
+      allowed = self.allowed(node)
+      for i in range(allowed):
+        child = node.children[i]
+        if child == None or len(child.children) == 0:
+          self.stats.explored += 1
+          path.append(self.child(node, i))
+          return path
+      node = max(node.children[:allowed], key=self.uct) # type: ignore
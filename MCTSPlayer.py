@@ -1,22 +1,46 @@
-from board import Move, Step, Piece, RankChars
+from board import Move, Piece, RankChars, STEPS, snapshot_state, snapshot_pieces
 from game import PlayerBase, StatsBase
+from playout import Playout
+from array import array
 from typing import TypeVar
-import time
 import math
+import sys
+import time
+try:
+  from batchboard import BatchBoard
+except ImportError:
+  # NumPy 2.0 or newer is optional, without it every rollout is played one at a time
+  BatchBoard = None
 
 Self = TypeVar("Self", bound="Node")
+END_TURN = -1 # The step id of the choice to end the turn without taking any more steps
 
 class Node:
-  boardState: str # The state of the board at this node
-  children: list[Self] # type: ignore
+  """
+  A node of the search tree, kept small since there are a lot of them
+    The children are made by BaseMCTSPlayer.child when they are first visited,
+    until then they are only a step id in steps and None in children
+  """
+  __slots__ = ("boardState", "steps", "children", "parent", "step", "player", "N", "Q")
+  boardState: bytes | None # The state of the board at this node, from Board.snapshot, made by BaseMCTSPlayer.position
+  steps: array # The step id of each child, in the same order as children
+  children: list[Self | None] # type: ignore
   parent: Self | None # type: ignore
-  step: Step | None # The step that led to this node
+  step: int # The id of the step that led to this node, END_TURN if it ended the turn
   player: int # The player making the step
   N: int # The number of times this node has been visited
-  Q: int # The total reward of this node and all it's children
+  Q: float # The total reward of this node and all it's children
+
+  def __init__(self, boardState: bytes | None, parent: Self | None, step: int, player: int) -> None: # type: ignore
+    self.reset(boardState, parent, step, player)
 
-  def __init__(self, boardState: str, parent: Self | None, step: Step | None, player: int) -> None: # type: ignore
-    self.children = []
+  def reset(self, boardState: bytes | None, parent: Self | None, step: int, player: int): # type: ignore
+    """
+    Set up the node as new, so nodes can be reused
+    """
+    # Nodes that are never expanded share the same empty children
+    self.steps = NO_STEPS
+    self.children = NO_CHILDREN # type: ignore
     self.N = 0
     self.Q = 0
     self.boardState = boardState
@@ -24,6 +48,38 @@ class Node:
     self.step = step
     self.player = player
 
+  def made_children(self) -> list[Self]: # type: ignore
+    """
+    The children that have been made, skipping the ones that were never visited
+    """
+    return [child for child in self.children if child != None] # type: ignore
+
+NO_STEPS = array("h")
+NO_CHILDREN = ()
+
+def tree_bytes(root: Node) -> tuple[int, int]:
+  """
+  Count the nodes in a tree and the bytes they use, including their positions and children
+  """
+  nodes = 0
+  size = 0
+  stack = [root]
+  # Nodes can be shared by several parents, so only count each once
+  seen = {root}
+  while len(stack) > 0:
+    node = stack.pop()
+    nodes += 1
+    size += sys.getsizeof(node)
+    if node.boardState != None:
+      size += sys.getsizeof(node.boardState)
+    if len(node.children) > 0:
+      size += sys.getsizeof(node.steps) + sys.getsizeof(node.children)
+      for child in node.made_children():
+        if child not in seen:
+          seen.add(child)
+          stack.append(child)
+  return nodes, size
+
 class MCTSStats(StatsBase):
   """
   Stats for the Monte-Carlo Tree Search
@@ -32,11 +88,30 @@ class MCTSStats(StatsBase):
   explored: int = 0 # Total number of nodes explored (considered for selection)
   created: int = 0 # Total number of nodes created
   rollouts: int = 0 # Total number of rollouts conducted
+  rolloutTime: float = 0 # Total time spent on rollouts, in seconds
+  nodes: int = 0 # Total number of nodes in the trees at the end of each turn, only counted with a node budget
+  reused: int = 0 # Total visits kept from the previous turn's search
+  peakNodes: int = 0 # The most nodes that were in a tree at once
+  peakBytes: int = 0 # The most memory a tree used at once, in bytes, measured when it fills the node budget
+  prunes: int = 0 # Total number of times the tree was pruned to fit in the node budget
+  pruned: int = 0 # Total number of nodes pruned
+  earlyStops: int = 0 # Total number of turns the search stopped before execTime
 
   def print(self):
     super().print()
     print(f"\t{self.iterations} iterations conducted ({self.iterations / self.turns} per turn)")
+    if self.iterations > 0:
+      print(f"\t{self.time / self.iterations * 1000:.2f}ms per iteration")
     print(f"\t{self.rollouts} rollouts conducted ({self.rollouts / self.turns} per turn)")
+    if self.rolloutTime > 0:
+      print(f"\t{self.rollouts / self.rolloutTime:.1f} playouts per second")
+    if self.nodes > 0:
+      print(f"\t{self.nodes / self.turns} nodes per turn, with a peak of {self.peakNodes} nodes in a tree")
+    print(f"\t{self.reused} visits reused from previous turns ({self.reused / self.turns} per turn)")
+    print(f"\t{self.pruned} nodes pruned in {self.prunes} prunes")
+    if self.peakBytes > 0:
+      print(f"\tThe tree used {self.peakBytes / 2**20:.1f}MB when it was full")
+    print(f"\t{self.earlyStops} turns stopped early ({self.earlyStops / self.turns} per turn)")
 
 
 class BaseMCTSPlayer(PlayerBase):
@@ -54,72 +129,322 @@ class BaseMCTSPlayer(PlayerBase):
   # so increasing it without the first may reduce skill instead.
  
   argnames = ["execTime", "rollout"]
-  stats: MCTSStats
+  stats: MCTSStats # type: ignore
   statsType = MCTSStats
+  playout: Playout # Plays the random games for simulate
+  # When there are at least this many rollouts, they are all played at once with BatchBoard, if NumPy is installed
+  # Smaller batches are slower than playing the games one at a time
+  batchRollouts = 128
+  # The most nodes to keep in a tree, when there are more the least visited subtrees are pruned, 0 for no limit
+  nodeBudget = 100000
+  pruneTo = 0.75 # The fraction of nodeBudget that pruning leaves
+  # execTime is the most time a search takes, it stops sooner when the move is decided
+  # With fewer pieces there are fewer steps to search, so the time is cut by up to this fraction as pieces are captured,
+  # unless the two most visited steps are within closeMargin of each other
+  phaseSaving = 0.5
+  closeMargin = 0.1
+  checkInterval = 0.01 # How often to check if the move is decided, in seconds
   
   def __init__(self, *args) -> None:
     super().__init__(*args)
-    self._nextRoot = None
+    self._nextRoot = None # Where the opponent's turn starts in the last search, kept to reuse it
+    self._stoppedEarly = False # If the last search stopped before execTime, so its first step is picked by visits
     self.execTime = int(args[0])
     self.rollout = int(args[1])
+    self.playout = Playout()
+    self._batch = None
+    # The unused nodes, kept when a tree is freed so the next search doesn't need to make them again
+    self._free = []
+    self._live = 0 # The number of nodes in the tree, kept up to date when there is a node budget
 
   def choose_move(self, boardState: str) -> Move:
-    startTime = time.time() # Keep track of execution time to limit calculation
-    root = Node(boardState, None, None, self.color)
+    root = self.search(boardState)
+    move, node, steps = self.best_move(root)
+    self.keep_subtree(node, steps)
+    if self.nodeBudget > 0:
+      # The node count is only kept up to date when there is a node budget, walking the tree to count it is too slow
+      self.stats.nodes += self._live
+      self.stats.peakNodes = max(self.stats.peakNodes, self._live)
+      self.free_subtree(root, self._nextRoot)
+    return move
+
+  def search(self, boardState: str) -> Node:
+    """
+    Search from a position for execTime seconds, and return the root of the tree
+    """
+    startTime = time.perf_counter() # Keep track of execution time to limit calculation
+    self.board.decode(boardState)
+    snapshot = self.board.snapshot()
+    root = self.reuse_root(snapshot)
+    if self.nodeBudget > 0 and self._nextRoot != None:
+      self.free_subtree(self._nextRoot, root)
+    if root == None:
+      root = self.new_node(snapshot, None, END_TURN, self.color)
+    else:
+      self.stats.reused += root.N
+    self._nextRoot = None
     self.expand(root)
-    while time.time() - startTime < self.execTime:
-      # 1 iteration of MCTS:
-      #   Select -> Expand -> Simulate -> Backpropagate
-      self.stats.iterations += 1
-      path = self.select(root)
-      leaf = path[-1]
-      self.expand(leaf)
-      reward = self.simulate(leaf)
-      self.backup(path, reward)
-      
+    pieces = sum(1 for piece in snapshot_pieces(snapshot) if piece != None)
+    target = self.execTime * (1 - self.phaseSaving * (1 - pieces / 32))
+    startN = root.N
+    deadline = startTime + self.execTime
+    self._stoppedEarly = False
+    lastCheck = startTime
+    while True:
+      if self.nodeBudget > 0 and self._live >= self.nodeBudget:
+        self.prune(root)
+      self.iterate(root)
+      now = time.perf_counter()
+      if now >= deadline:
+        break
+      # Looking through the root's children takes longer, so that is only done every checkInterval
+      if now - lastCheck >= self.checkInterval:
+        lastCheck = now
+        elapsed = now - startTime
+        if self.decided(root, (root.N - startN) / elapsed * (deadline - now), elapsed >= target):
+          self.stats.earlyStops += 1
+          self._stoppedEarly = True
+          break
+    return root
+
+  def decided(self, root: Node, remaining: float, targetPassed: bool) -> bool:
+    """
+    Check if the search can stop, because the most visited step can't be overtaken in the remaining visits,
+      or the time for this point of the game has passed and the most visited step is far enough ahead
+      The move then starts with the most visited step, which the first reason makes sure more time couldn't change
+    """
+    index = self.best_child(root)
+    if index == -1:
+      return False
+    best = root.children[index]
+    first = 0
+    second = 0
+    for child in root.children:
+      N = 0 if child == None else child.N
+      if N > first:
+        first, second = N, first
+      elif N > second:
+        second = N
+    # The step with the best score needs to also be the most visited, or stopping would pick a different step
+    # than the full search would have right now, like one the solver has proven to lose
+    if best.N != first: # type: ignore
+      return False
+    if first - second > remaining:
+      return True
+    return targetPassed and first - second > self.closeMargin * first
+
+  def new_node(self, boardState: bytes | None, parent: Node | None, step: int, player: int) -> Node:
+    """
+    Make a node, reusing an unused one if there are any
+    """
+    self._live += 1
+    if len(self._free) > 0:
+      node = self._free.pop()
+      node.reset(boardState, parent, step, player)
+      return node
+    return Node(boardState, parent, step, player)
+
+  def free_subtree(self, node: Node, keep: Node | None = None) -> int:
+    """
+    Put a node and all its children back into the unused nodes, except for the subtree at keep,
+      and return how many were freed
+    """
+    freed = 0
+    stack = [node]
+    while len(stack) > 0:
+      node = stack.pop()
+      if node is keep:
+        continue
+      stack.extend(node.made_children())
+      # Drop everything the node refers to, so it can be freed while the node waits to be reused
+      node.reset(None, None, END_TURN, 0)
+      if len(self._free) < self.nodeBudget:
+        self._free.append(node)
+      freed += 1
+    self._live -= freed
+    return freed
+
+  def prune(self, root: Node):
+    """
+    Prune the least visited nodes until the tree is down to pruneTo of the node budget,
+      the root and its children are always kept so the statistics of the move are not lost
+    """
+    nodes, size = tree_bytes(root)
+    self.stats.peakNodes = max(self.stats.peakNodes, nodes)
+    self.stats.peakBytes = max(self.stats.peakBytes, size)
+    self.stats.prunes += 1
+    # Every node below the root's children, with its depth
+    candidates = []
+    stack = [(child, 2) for child in root.made_children()]
+    while len(stack) > 0:
+      node, depth = stack.pop()
+      for child in node.made_children():
+        candidates.append((child, depth))
+        stack.append((child, depth + 1))
+    # The least visited first, and the deepest first between nodes with the same visits
+    # A node is never visited more than its parent, so every node comes after the nodes below it,
+    # and is a leaf by the time it is cut, which lets the pruning stop at exactly the right number of nodes
+    candidates.sort(key=lambda pair: (pair[0].N, -pair[1]))
+    keep = int(self.nodeBudget * self.pruneTo)
+    for node, _ in candidates:
+      if self._live <= keep:
+        break
+      parent = node.parent
+      parent.children[parent.children.index(node)] = None # type: ignore
+      self.stats.pruned += self.free_subtree(node)
+
+  def iterate(self, root: Node):
+    """
+    1 iteration of MCTS:
+      Select -> Expand -> Simulate -> Backpropagate
+    """
+    self.stats.iterations += 1
+    path = self.select(root)
+    leaf = path[-1]
+    self.expand(leaf)
+    reward = self.simulate(leaf)
+    self.backup(path, reward)
+
+  def best_move(self, root: Node) -> tuple[Move, Node, int]:
+    """
+    Find the best move from a searched root, with the node it ends at and the number of steps it takes
+    """
     # Find the best step by examining the current nodes's children
     # Do that until we find a node that ends our turn, or we reach four steps
-    bestNode = max(root.children, key=self.score)
+    node: Node = root
     move = []
     steps = 0
     while steps < 4:
-      step = bestNode.step
-      if step == None:
+      # Stopping early only makes sure the most visited first step can't change
+      if node is root and self._stoppedEarly:
+        index = self.most_visited(node)
+      else:
+        index = self.best_child(node)
+      if index == -1 or node.steps[index] == END_TURN:
         break
-      if steps == 3 and step.opOldPos != None:
+      step = STEPS[node.steps[index]]
+      if steps + step.length > 4: # type: ignore
         break
       move.append(step)
-      steps += 1
-      if step.opOldPos != None:
-        steps += 1
-      if len(bestNode.children) == 0:
-        break
-      bestNode = max(bestNode.children, key=self.score)
+      steps += step.length # type: ignore
+      node = node.children[index] # type: ignore
+    return tuple(move), node, steps # type: ignore
 
-    return tuple(move)
+  def keep_subtree(self, node: Node, steps: int):
+    """
+    Keep the subtree where the opponent's turn starts after our move, which ends at node after the given number of steps
+      Everything else is freed once the old root is dropped
+    """
+    # Four steps finish the turn, otherwise it is finished by the node's end turn child
+    if steps < 4:
+      # The children might have been reordered, so the end turn child is looked for by its step
+      if END_TURN not in node.steps:
+        return
+      node = node.children[node.steps.index(END_TURN)] # type: ignore
+      if node == None:
+        return
+    self.position(node)
+    node.parent = None
+    self._nextRoot = node
+
+  def reuse_root(self, boardState: bytes) -> Node | None:
+    """
+    Find the node with a position in the subtree kept from the last turn, by looking through the opponent's steps
+    """
+    if self._nextRoot == None:
+      return None
+    nodes = [self._nextRoot]
+    # The opponent takes at most four steps, and then ends their turn
+    for _ in range(5):
+      deeper = []
+      for node in nodes:
+        if self.position(node) == boardState:
+          node.parent = None
+          node.player = self.color
+          return node
+        deeper.extend(node.made_children())
+      nodes = deeper
+    return None
   
+  def load(self, boardState: bytes):
+    """
+    Set the board to a node's position, forgetting the history of the previous one
+    """
+    self.board.restore(boardState)
+    self.board.history.clear()
+
+  def best_child(self, node: Node) -> int:
+    """
+    The index of the child with the best score, or -1 if no children have been made
+    """
+    best = -1
+    for i, child in enumerate(node.children):
+      if child != None and (best == -1 or self.score(child) > self.score(node.children[best])): # type: ignore
+        best = i
+    return best
+
+  def most_visited(self, node: Node) -> int:
+    """
+    The index of the child with the most visits, or -1 if no children have been made
+    """
+    best = -1
+    for i, child in enumerate(node.children):
+      if child != None and (best == -1 or child.N > node.children[best].N): # type: ignore
+        best = i
+    return best
+
+  def position(self, node: Node) -> bytes:
+    """
+    The position at a node, made from its parent's position and step the first time it is needed
+    """
+    if node.boardState == None:
+      node.boardState = self.after_step(self.position(node.parent), node.step) # type: ignore
+    return node.boardState
+
+  def after_step(self, boardState: bytes, step: int) -> bytes:
+    """
+    The position after taking a step (or ending the turn) from a position
+    """
+    self.load(boardState)
+    if step == END_TURN:
+      self.board.finish_turn()
+    else:
+      self.board.apply_step(STEPS[step]) # type: ignore
+      if self.board.state.left == 0:
+        self.board.finish_turn()
+    return self.board.snapshot()
+
   def expand(self, node: Node):
     """
-    Expand a node by adding children for each of the possible steps at that states
+    Expand a node by listing the possible steps at that state, the children for them are made when they are visited
     """
     if len(node.children) > 0:
       return
-    self.board.decode(node.boardState)
-    player = self.board.state.player
+    self.load(self.position(node))
+    # Nobody moves once the game is over
+    if self.board.state.end:
+      return
+    steps = array("h")
     # If this is not the first step of the turn,
     # add the option to end the turn and not take any more steps
     if self.board.state.left != 4:
-      self.board.finish_turn()
-      self.stats.created += 1
-      node.children.append(Node(self.board.encode(), node, None, player))
-      self.board.undo()
+      steps.append(END_TURN)
     for step in self.board.possible_steps():
-      self.board.do_step(step)
-      if self.board.state.left == 0:
-        self.board.finish_turn()
+      steps.append(step.id)
+    node.steps = steps
+    node.children = [None] * len(steps)
+
+  def child(self, node: Node, index: int) -> Node:
+    """
+    Get a child of an expanded node, making it if it hasn't been visited yet
+    """
+    child = node.children[index]
+    if child == None:
       self.stats.created += 1
-      node.children.append(Node(self.board.encode(), node, step, player))
-      self.board.undo_step()
+      player = snapshot_state(node.boardState).player # type: ignore
+      child = self.new_node(None, node, node.steps[index], player)
+      node.children[index] = child
+    return child
 
   def select(self, node: Node):
     """
@@ -131,34 +456,45 @@ class BaseMCTSPlayer(PlayerBase):
       self.stats.explored += 1
       if len(node.children) == 0:
         return path
-      for child in node.children:
-        if len(child.children) == 0:
+      for i, child in enumerate(node.children):
+        if child == None or len(child.children) == 0:
           self.stats.explored += 1
-          path.append(child)
+          path.append(self.child(node, i))
           return path
-      node = max(node.children, key=self.uct)
+      # Every child has been made by now
+      node = max(node.made_children(), key=self.uct)
 
-  def simulate(self, node: Node):
+  def simulate(self, node: Node) -> float:
     """
     Simulate a node by running random games and tracking who wins
     """
     reward = 0
+    startTime = time.perf_counter()
+    if BatchBoard != None and self.rollout >= self.batchRollouts:
+      if self._batch == None:
+        self._batch = BatchBoard()
+      winners = self._batch.play([self.position(node)] * self.rollout)
+      self.stats.rollouts += self.rollout
+      # 1 for each win and -1 for each loss
+      reward = 2 * int((winners == self.color).sum()) - self.rollout
+      self.stats.rolloutTime += time.perf_counter() - startTime
+      return reward
+    boardState = self.position(node)
     for _ in range(self.rollout):
       self.stats.rollouts += 1
-      self.board.decode(node.boardState)
-      while not self.board.state.end:
-        self.board.do_move(self.board.random_move())
+      winner = self.playout.play(boardState)
 
-      if self.board.state.player == self.color:
+      if winner == self.color:
         # If we win, the reward is 1
         reward += 1
       else:
         # If we lose, the "reward" is -1
         reward -= 1
+    self.stats.rolloutTime += time.perf_counter() - startTime
     
     return reward
   
-  def backup(self, path: list[Node], reward: int):
+  def backup(self, path: list[Node], reward: float):
     """
     Propogate the reward back up the tree, increasing the N and Q values appropriately
     """
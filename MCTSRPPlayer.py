@@ -0,0 +1,118 @@
+import multiprocessing
+import random
+import weakref
+from array import array
+from board import Move, STEPS
+from MCTSPlayer import BaseMCTSPlayer, MCTSPlayer, MCTSStats, Node, END_TURN
+
+# The statistics of every node in our turn, keyed by the steps from the root that lead to it
+TurnStats = dict[tuple[int, ...], tuple[int, float]]
+
+def turn_stats(node: Node, path: tuple[int, ...], steps: int, out: TurnStats):
+  """
+  Collect the N and Q of the made nodes below a node, stopping where our turn ends
+  """
+  for i, child in enumerate(node.children):
+    if child == None:
+      continue
+    step = node.steps[i]
+    out[path + (step,)] = (child.N, child.Q)
+    if step != END_TURN and steps + STEPS[step].length < 4: # type: ignore
+      turn_stats(child, path + (step,), steps + STEPS[step].length, out) # type: ignore
+
+# Each worker process keeps its player between jobs, so its node pool is only made once
+_player: MCTSPlayer | None = None
+
+def search_root(args: tuple[str, int, int, int, int]) -> tuple[TurnStats, MCTSStats]:
+  """
+  Run one worker's search, and return the statistics of our turn with the worker's MCTSStats
+  """
+  global _player
+  boardState, color, execTime, rollout, seed = args
+  random.seed(seed)
+  if _player == None or _player.execTime != execTime or _player.rollout != rollout:
+    _player = MCTSPlayer(str(execTime), str(rollout))
+  player = _player
+  player.color = color
+  # Only this search's stats are sent back
+  player.stats = MCTSStats(player.name, player.__class__.name)
+  root = player.search(boardState)
+  out = {}
+  turn_stats(root, (), 0, out)
+  player.stats.nodes = player._live
+  player.stats.peakNodes = max(player.stats.peakNodes, player._live)
+  player.free_subtree(root)
+  return out, player.stats
+
+class MCTSRPPlayer(BaseMCTSPlayer):
+  """
+  Root parallel MCTS player, every worker process searches the same root with a different seed
+    and the statistics of the steps in our turn are added up to choose the move
+  """
+  name = "MCTSRPPlayer"
+  # Takes 3 arguments, the two of BaseMCTSPlayer and:
+  argcount = 3
+  #   3) The number of worker processes to search with
+  workers: int
+  argnames = ["execTime", "rollout", "workers"]
+  nodeBudget = 0 # The searches are done by the workers
+
+  def __init__(self, *args) -> None:
+    super().__init__(*args)
+    self.workers = int(args[2])
+    self._pool = None
+    self._closePool = None
+
+  def choose_move(self, boardState: str) -> Move:
+    # The pool is kept for the whole game, since starting processes is slow
+    if self._pool == None:
+      self._pool = multiprocessing.Pool(self.workers)
+      # Shut the workers down when the player is freed or the program exits
+      self._closePool = weakref.finalize(self, self._pool.terminate)
+    jobs = [(boardState, self.color, self.execTime, self.rollout, random.getrandbits(32)) for _ in range(self.workers)]
+    merged: TurnStats = {}
+    earlyStops = 0
+    for out, stats in self._pool.map(search_root, jobs):
+      for path, (N, Q) in out.items():
+        total = merged.get(path, (0, 0))
+        merged[path] = (total[0] + N, total[1] + Q)
+      self.stats.iterations += stats.iterations
+      self.stats.explored += stats.explored
+      self.stats.created += stats.created
+      self.stats.rollouts += stats.rollouts
+      self.stats.rolloutTime += stats.rolloutTime
+      self.stats.nodes += stats.nodes
+      self.stats.prunes += stats.prunes
+      self.stats.pruned += stats.pruned
+      self.stats.peakNodes = max(self.stats.peakNodes, stats.peakNodes)
+      self.stats.peakBytes = max(self.stats.peakBytes, stats.peakBytes)
+      earlyStops += stats.earlyStops
+    # The turn only ends early if every worker stopped early
+    self._stoppedEarly = earlyStops == self.workers
+    if self._stoppedEarly:
+      self.stats.earlyStops += 1
+
+    # Rebuild the top of the tree from the merged statistics, and pick the move from it like a normal search
+    root = Node(None, None, END_TURN, self.color)
+    nodes: dict[tuple[int, ...], Node] = {(): root}
+    for path in sorted(merged, key=len):
+      parent = nodes[path[:-1]]
+      if len(parent.children) == 0:
+        parent.steps = array("h")
+        parent.children = []
+      child = Node(None, parent, path[-1], self.color)
+      child.N, child.Q = merged[path]
+      parent.steps.append(path[-1])
+      parent.children.append(child)
+      nodes[path] = child
+    move, _, _ = self.best_move(root)
+    return move
+
+  def close(self):
+    """
+    Shut down the worker processes, they are started again if the player moves again
+    """
+    if self._closePool != None:
+      self._closePool()
+      self._pool = None
+      self._closePool = None
@@ -1,6 +1,7 @@
 import math
 from random import choice
-from MCTSPlayer import BaseMCTSPlayer, Node
+from board import STEPS, snapshot_state
+from MCTSPlayer import BaseMCTSPlayer, Node, END_TURN
 
 inf = 2**31
 
@@ -23,40 +24,57 @@ class MCTSSolverPlayer(BaseMCTSPlayer):
       if len(node.children) == 0:
         return path
       if node.N == 1:
-        win = False
-        self.board.decode(node.boardState)
-        curPlayer = self.board.state.player
-        for child in node.children:
-          self.board.decode(node.boardState)
-          if self.board.state.end and self.board.state.player == curPlayer:
-            win = True
-        if win:
+        curPlayer = snapshot_state(self.position(node)).player
+        if self.winning_step(node):
           node.Q = inf if curPlayer == self.color else -inf
           return path
       random = False
-      for child in node.children:
-        if child.Q == -inf and child.N < self.visitThreshold:
-          random = True
-        if child.Q == inf or len(child.children) == 0:
+      for i, child in enumerate(node.children):
+        if child == None or child.Q == inf or len(child.children) == 0:
           self.stats.explored += 1
-          path.append(child)
+          path.append(self.child(node, i))
           return path
+        if child.Q == -inf and child.N < self.visitThreshold:
+          random = True
       if random:
-        node = choice(node.children)
+        node = choice(node.made_children())
+      else:
+        node = max(node.made_children(), key=self.uct)
+
+  def winning_step(self, node: Node) -> bool:
+    """
+    Check if any of an expanded node's steps wins the game for the moving player, without making the children
+    """
+    self.load(self.position(node))
+    player = self.board.state.player
+    for step in node.steps:
+      if step == END_TURN:
+        self.board.finish_turn()
+      else:
+        self.board.apply_step(STEPS[step]) # type: ignore
+        if self.board.state.left == 0:
+          self.board.finish_turn()
+      state = self.board.state
+      win = state.end and state.player == player
+      if step == END_TURN:
+        self.board.undo_turn()
       else:
-        node = max(node.children, key=self.uct)
+        self.board.undo_step()
+      if win:
+        return True
+    return False
 
   def simulate(self, node: Node):
-    self.board.decode(node.boardState)
-    if self.board.state.end:
-      if self.board.state.player == self.color:
+    state = snapshot_state(self.position(node))
+    if state.end:
+      if state.player == self.color:
         return inf
       else:
         return -inf
     else:
       return super().simulate(node)
   
-  def backup(self, path: list[Node], reward: int):
+  def backup(self, path: list[Node], reward: float):
     prevPlayer = -1
     prevNode: Node = None # type: ignore
     for node in reversed(path):
@@ -87,7 +105,7 @@ class MCTSSolverPlayer(BaseMCTSPlayer):
   @staticmethod
   def check_children(node: Node, val: int) -> bool:
     for child in node.children:
-      if child.Q != val:
+      if child == None or child.Q != val:
         return False
     return True
 
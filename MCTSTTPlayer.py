@@ -0,0 +1,108 @@
+import math
+from board import snapshot_state
+from MCTSPlayer import BaseMCTSPlayer, MCTSStats, Node
+
+class MCTSTTStats(MCTSStats):
+  """
+  Stats for the Monte-Carlo Tree Search with a transposition table
+  """
+  transpositions: int = 0 # Total number of times a step led to a position that already had a node
+
+  def print(self):
+    super().print()
+    print(f"\t{self.transpositions} transpositions found ({self.transpositions / self.turns} per turn)")
+
+class MCTSTTPlayer(BaseMCTSPlayer):
+  """
+  MCTS player that shares one node between every order of steps that reaches the same position,
+    so the search is a graph instead of a tree
+  """
+  name = "MCTSTTPlayer"
+  stats: MCTSTTStats # type: ignore
+  statsType = MCTSTTStats
+  table: dict[bytes, Node] # The node for each position, keyed by Board.snapshot
+  # Nodes can have several parents, so a pruned or freed node might still be used by another one
+  nodeBudget = 0
+
+  def __init__(self, *args) -> None:
+    super().__init__(*args)
+    self.table = {}
+
+  def child(self, node: Node, index: int) -> Node:
+    """
+    Get a child of an expanded node, using the node for its position if there already is one
+      A shared node keeps the parent and step it was first made with, they are only used to make its position
+    """
+    child = node.children[index]
+    if child == None:
+      boardState = self.after_step(self.position(node), node.steps[index])
+      child = self.table.get(boardState)
+      if child == None:
+        self.stats.created += 1
+        player = snapshot_state(node.boardState).player # type: ignore
+        child = self.new_node(boardState, node, node.steps[index], player)
+        self.table[boardState] = child
+      else:
+        self.stats.transpositions += 1
+      node.children[index] = child
+    return child
+
+  def expand(self, node: Node):
+    # The root is the only node that wasn't made by child, so it needs to be added here
+    self.table.setdefault(self.position(node), node)
+    super().expand(node)
+
+  def select(self, node: Node):
+    """
+    Select a node to explore this iteration, by choosing children by uct until we find an unexplored node
+      A node is never selected twice in one path, so the positions repeating between turns can't loop
+    """
+    path = []
+    visited = set()
+    while True:
+      path.append(node)
+      visited.add(node)
+      self.stats.explored += 1
+      if len(node.children) == 0:
+        return path
+      for i, child in enumerate(node.children):
+        if child == None or len(child.children) == 0:
+          child = self.child(node, i)
+          # A new child might be a position that was already expanded through other steps
+          if len(child.children) == 0 and child not in visited:
+            self.stats.explored += 1
+            path.append(child)
+            return path
+      choices = [child for child in node.children if child not in visited]
+      if len(choices) == 0:
+        return path
+      parentN = node.N
+      node = max(choices, key=lambda child: self.edge_uct(child, parentN)) # type: ignore
+
+  # backup is unchanged, every node in the path is updated once, so a node with several parents
+  # adds up the visits and rewards from all of them
+
+  @staticmethod
+  def edge_uct(node: Node, parentN: int):
+    """
+    Upper Confidence Bounds for Trees, using the visits of the parent we came from since a node can have several
+    """
+    if node.N == 0:
+      return float("inf")
+    return node.Q / node.N + math.sqrt(2) * math.sqrt(math.log(parentN) / node.N)
+
+  def keep_subtree(self, node: Node, steps: int):
+    super().keep_subtree(node, steps)
+    # The table would keep every node alive, so it is made again from the kept nodes
+    self.table = {}
+
+  def reuse_root(self, boardState: bytes) -> Node | None:
+    root = super().reuse_root(boardState)
+    if root != None:
+      stack = [root]
+      while len(stack) > 0:
+        for child in stack.pop().made_children():
+          if child.boardState not in self.table:
+            self.table[child.boardState] = child # type: ignore
+            stack.append(child)
+    return root
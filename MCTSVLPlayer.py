@@ -0,0 +1,61 @@
+import time
+from MCTSPlayer import BaseMCTSPlayer, Node, BatchBoard
+
+class MCTSVLPlayer(BaseMCTSPlayer):
+  """
+  MCTS player that selects a batch of leaves at once and simulates them together,
+    giving each selected path a virtual loss so the next selections go somewhere else
+  """
+  name = "MCTSVLPlayer"
+  # Takes 3 arguments, the two of BaseMCTSPlayer and:
+  argcount = 3
+  #   3) The number of leaves to select before simulating them
+  leaves: int
+  argnames = ["execTime", "rollout", "leaves"]
+  virtualLoss = 1 # The reward taken away from each node in a selected path until it is simulated
+
+  def __init__(self, *args) -> None:
+    super().__init__(*args)
+    self.leaves = int(args[2])
+
+  def iterate(self, root: Node):
+    paths = []
+    selected = set()
+    for _ in range(self.leaves):
+      path = self.select(root)
+      leaf = path[-1]
+      # Once a finished game or a fully explored tree is reached, the same leaf would be selected again
+      if leaf in selected:
+        break
+      selected.add(leaf)
+      self.expand(leaf)
+      for node in path:
+        node.N += 1
+        node.Q -= self.virtualLoss
+      paths.append(path)
+    self.stats.iterations += len(paths)
+    rewards = self.simulate_all([path[-1] for path in paths])
+    for path, reward in zip(paths, rewards):
+      for node in path:
+        node.N -= 1
+        node.Q += self.virtualLoss
+      self.backup(path, reward)
+
+  def simulate_all(self, leaves: list[Node]) -> list[float]:
+    """
+    Simulate several leaves, playing all of their random games at once with BatchBoard if there are enough
+    """
+    if BatchBoard == None or self.rollout * len(leaves) < self.batchRollouts:
+      return [self.simulate(leaf) for leaf in leaves]
+    startTime = time.perf_counter()
+    if self._batch == None:
+      self._batch = BatchBoard()
+    boardStates = []
+    for leaf in leaves:
+      boardStates += [self.position(leaf)] * self.rollout
+    winners = self._batch.play(boardStates)
+    wins = (winners == self.color).reshape(len(leaves), self.rollout).sum(axis=1)
+    self.stats.rollouts += len(boardStates)
+    self.stats.rolloutTime += time.perf_counter() - startTime
+    # 1 for each win and -1 for each loss
+    return [2 * int(win) - self.rollout for win in wins]
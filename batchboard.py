@@ -0,0 +1,288 @@
+import random
+import numpy as np
+if not hasattr(np, "bitwise_count"):
+  # The pieces in every game are counted with bitwise_count, which was added in NumPy 2.0
+  raise ImportError("batchboard needs NumPy 2.0 or newer")
+
+from board import COLORS, RANKS, STEPS, STEP_KINDS, TRAP_SQUARES, GOAL_MASKS, step_id, \
+  snapshot_pieces, snapshot_state, make_piece
+from bitboard import FULL, FILE_A, FILE_H
+
+# Every game is a set of 64 bit masks like BitBoard's, one per side and rank, so each operation works on all games at once
+# For each direction in the same order as DIRECTIONS (east, west, south, north),
+#   the squares that can move that way and how far to shift them left and right
+_KEEP = [np.uint64(FULL ^ FILE_H), np.uint64(FULL ^ FILE_A), np.uint64(FULL), np.uint64(FULL)]
+_LEFT = [np.uint64(1), np.uint64(0), np.uint64(8), np.uint64(0)]
+_RIGHT = [np.uint64(0), np.uint64(1), np.uint64(0), np.uint64(8)]
+_OPPOSITE = [1, 0, 3, 2]
+
+def shift(masks: np.ndarray, dir: int) -> np.ndarray:
+  """
+  Move every square of the masks one step in a direction
+  """
+  return ((masks & _KEEP[dir]) << _LEFT[dir]) >> _RIGHT[dir]
+
+def adjacent(masks: np.ndarray) -> np.ndarray:
+  """
+  Get every square next to a square in the masks
+  """
+  return shift(masks, 0) | shift(masks, 1) | shift(masks, 2) | shift(masks, 3)
+
+def union(masks: np.ndarray) -> np.ndarray:
+  """
+  Combine the masks along the first axis
+    Much faster than np.bitwise_or.reduce for the short axes here
+  """
+  result = masks[0].copy()
+  for mask in masks[1:]:
+    result |= mask
+  return result
+
+# Every kind of step from a square, as (direction, kind, enemy direction), in the order legal_steps gives their masks
+STEP_GROUPS: list[tuple[int, int, int]] = [(dir, STEP_KINDS.NORMAL, 0) for dir in range(4)]
+STEP_GROUPS += [(dir, STEP_KINDS.PUSH, opDir) for dir in range(4) for opDir in range(4) if opDir != _OPPOSITE[dir]]
+STEP_GROUPS += [(dir, STEP_KINDS.PULL, opDir) for opDir in range(4) for dir in range(4) if dir != opDir]
+# The step id of each group without the square
+_GROUP_IDS = np.array([step_id(0, dir, kind, opDir) for dir, kind, opDir in STEP_GROUPS])
+# The squares and length of every step id, 64 stands in for no square
+_OLD = np.array([step.oldSq if step != None else 0 for step in STEPS], dtype=np.uint64)
+_NEW = np.array([step.newSq if step != None else 0 for step in STEPS], dtype=np.uint64)
+_OP_OLD = np.array([step.opOldSq if step != None and step.opOldSq != -1 else 64 for step in STEPS], dtype=np.uint64)
+_OP_NEW = np.array([step.opNewSq if step != None and step.opNewSq != -1 else 64 for step in STEPS], dtype=np.uint64)
+_LENGTH = np.array([step.length if step != None else 0 for step in STEPS], dtype=np.int8)
+_TRAPS = np.uint64(sum(1 << sq for sq in TRAP_SQUARES))
+_GOALS = np.array(GOAL_MASKS, dtype=np.uint64)
+# The direction rabbits of each color cannot move in
+_BACKWARDS = [2, 3]
+
+def _bit(squares: np.ndarray) -> np.ndarray:
+  """
+  Get the masks of single squares, square 64 gives an empty mask
+  """
+  return np.where(squares < 64, np.uint64(1) << (squares & np.uint64(63)), np.uint64(0))
+
+class BatchBoard:
+  """
+  Many boards held in NumPy arrays that all play random games at once, one step per game at a time
+    Follows the same rules as Board, and picks moves the same way as Board.random_move
+    Games are dropped from the arrays as they end, so only the ones still going are worked on
+  """
+  # The arrays of the games still going, the last axis is the game
+  bb: np.ndarray # The squares of each piece, by side (0 for the player to move) then rank
+  games: np.ndarray # The number of each game, in the order the snapshots were given
+  player: np.ndarray # Whose turn it is
+  left: np.ndarray # How many steps are left in the current turn
+  budget: np.ndarray # How many more steps to try to take this turn
+  winners: np.ndarray # The winner of every game, -1 if it is still going
+  rng: np.random.Generator
+
+  def __init__(self) -> None:
+    # Seeded from random so seeding random makes the games repeatable
+    self.rng = np.random.default_rng(random.getrandbits(64))
+    self.load([])
+
+  def load(self, snapshots: list[bytes]):
+    """
+    Set up one game for each Board.snapshot
+    """
+    count = len(snapshots)
+    bb = np.zeros((2, 6, count), dtype=np.uint64)
+    self.player = np.zeros(count, dtype=np.int64)
+    self.left = np.zeros(count, dtype=np.int8)
+    self.winners = np.full(count, -1)
+    # Usually every snapshot is the same position, so each one is only read once
+    read = dict()
+    for i, snapshot in enumerate(snapshots):
+      if snapshot not in read:
+        state = snapshot_state(snapshot)
+        masks = [[0] * 6, [0] * 6]
+        for sq, piece in enumerate(snapshot_pieces(snapshot)):
+          if piece != None:
+            masks[(piece >> 3) != state.player][piece & 7] |= 1 << sq
+        read[snapshot] = (masks, state)
+      masks, state = read[snapshot]
+      bb[:, :, i] = masks
+      self.player[i] = state.player
+      self.left[i] = state.left
+      if state.end:
+        self.winners[i] = state.player
+    self.bb = bb
+    self.games = np.arange(count)
+    self.budget = self._pick_budget(self.left)
+    self._drop(self.winners != -1)
+
+  def snapshot(self, game: int) -> bytes:
+    """
+    Pack a game that is still going into the same format as Board.snapshot
+    """
+    column = int(np.flatnonzero(self.games == game)[0])
+    player = int(self.player[column])
+    data = [0] * 64
+    for side in range(2):
+      for rank in range(6):
+        mask = int(self.bb[side, rank, column])
+        for sq in range(64):
+          if mask >> sq & 1:
+            data[sq] = make_piece(player ^ side, rank) + 1
+    packed = bytearray(data[2 * i] << 4 | data[2 * i + 1] for i in range(32))
+    packed.append((player << 3) | (int(self.left[column]) + 1))
+    return bytes(packed)
+
+  def _pick_budget(self, left: np.ndarray) -> np.ndarray:
+    """
+    Pick how many steps to take in a turn, with the same bias towards using more steps as Board.random_move
+    """
+    return np.minimum(self.rng.integers(1, left.astype(np.int64) + 4), left).astype(np.int8)
+
+  def _drop(self, ended: np.ndarray):
+    """
+    Remove the games in the mask from the arrays
+    """
+    if ended.any():
+      keep = ~ended
+      self.bb = self.bb[:, :, keep]
+      self.games = self.games[keep]
+      self.player = self.player[keep]
+      self.left = self.left[keep]
+      self.budget = self.budget[keep]
+
+  def legal_steps(self) -> np.ndarray:
+    """
+    Get the squares of the pieces that can make each group of steps in STEP_GROUPS, for each game still going
+    """
+    mine = self.bb[0]
+    theirs = self.bb[1]
+    myOcc = union(mine)
+    empty = ~(myOcc | union(theirs))
+
+    # The enemies stronger and weaker than each rank
+    stronger = np.zeros(theirs.shape, dtype=np.uint64)
+    weaker = np.zeros(theirs.shape, dtype=np.uint64)
+    for rank in range(RANKS.ELEPHANT - 1, RANKS.RABBIT - 1, -1):
+      stronger[rank] = stronger[rank + 1] | theirs[rank + 1]
+      weaker[RANKS.ELEPHANT - rank] = weaker[RANKS.ELEPHANT - rank - 1] | theirs[RANKS.ELEPHANT - rank - 1]
+    # A piece can move unless it has a stronger enemy next to it and no friend
+    pieces = mine & ~(adjacent(stronger) & ~adjacent(myOcc))
+    movable = union(pieces[1:])
+    rabbits = pieces[RANKS.RABBIT]
+    # The pieces that have a weaker enemy in each direction, for pushes and pulls
+    pushers = [union(pieces & shift(weaker, _OPPOSITE[dir])) for dir in range(4)]
+    if (self.left < 2).any():
+      pushers = [np.where(self.left > 1, mask, np.uint64(0)) for mask in pushers]
+    # The pieces with an empty square in each direction
+    emptyFrom = [shift(empty, _OPPOSITE[dir]) for dir in range(4)]
+
+    masks = np.empty((len(STEP_GROUPS), len(self.games)), dtype=np.uint64)
+    for i, (dir, kind, opDir) in enumerate(STEP_GROUPS):
+      if kind == STEP_KINDS.NORMAL:
+        steppers = movable | rabbits
+        # Rabbits cannot move backwards
+        for color in (COLORS.GOLD, COLORS.SILVER):
+          if dir == _BACKWARDS[color]:
+            steppers = np.where(self.player == color, movable, steppers)
+        masks[i] = steppers & emptyFrom[dir]
+      elif kind == STEP_KINDS.PUSH:
+        # The enemy in front is pushed on to an empty square
+        masks[i] = pushers[dir] & shift(emptyFrom[opDir], _OPPOSITE[dir])
+      else:
+        # The piece steps to an empty square and the enemy behind is pulled after it
+        masks[i] = pushers[opDir] & emptyFrom[dir]
+    return masks
+
+  def finish_turn(self, finished: np.ndarray):
+    """
+    Start the next player's turn in the games in the mask, ending any that someone won
+      Running out of steps is checked by step, since it needs the legal steps
+    """
+    if not finished.any():
+      return
+    self.bb[:, :, finished] = self.bb[::-1, :, finished]
+    self.player[finished] ^= 1
+    self.left[finished] = 4
+    self.budget[finished] = self._pick_budget(self.left[finished])
+    # Player A just finished their turn, player B is starting theirs
+    playerB = self.player
+    playerA = 1 - playerB
+    rabbitsA = self.bb[1, RANKS.RABBIT]
+    rabbitsB = self.bb[0, RANKS.RABBIT]
+    # Checked backwards from Board._check_win, so the earlier checks overwrite the later ones
+    winner = np.full(len(self.games), -1)
+    for won, color in ((rabbitsA == 0, playerB), (rabbitsB == 0, playerA),
+                       (rabbitsB & _GOALS[playerB] != 0, playerB), (rabbitsA & _GOALS[playerA] != 0, playerA)):
+      winner = np.where(won, color, winner)
+    ended = finished & (winner != -1)
+    self.winners[self.games[ended]] = winner[ended]
+    self._drop(ended)
+
+  def step(self) -> np.ndarray:
+    """
+    Advance every game that is still going by one step, finishing turns that are done first
+      Returns the id of the step made in every game, or -1 if none was
+    """
+    chosen = np.full(len(self.winners), -1)
+    self.finish_turn(self.budget == 0)
+    if len(self.games) == 0:
+      return chosen
+    masks = self.legal_steps()
+    counts = np.bitwise_count(masks).astype(np.int16)
+    totals = counts.sum(0)
+    # A player with no steps at the start of their turn loses, otherwise they just end their turn
+    moving = totals > 0
+    if not moving.all():
+      lost = ~moving & (self.left == 4)
+      self.winners[self.games[lost]] = 1 - self.player[lost]
+      self.budget[~moving] = 0
+      self._drop(lost)
+      moving = moving[~lost]
+      masks = masks[:, ~lost]
+      counts = counts[:, ~lost]
+      totals = totals[~lost]
+      if not moving.any():
+        return chosen
+
+    # Pick one of each game's legal steps uniformly, then find which group and square it is
+    index = (self.rng.random(len(self.games)) * totals).astype(np.int16)
+    # np.cumsum is very slow along the first axis, so add up the groups one by one
+    ends = np.empty_like(counts)
+    ends[0] = counts[0]
+    for i in range(1, len(STEP_GROUPS)):
+      np.add(ends[i - 1], counts[i], out=ends[i])
+    # Games that are not moving have nothing to pick, so keep them to a group that exists
+    group = np.minimum((ends <= index).sum(0), len(STEP_GROUPS) - 1)
+    columns = np.arange(len(self.games))
+    index -= ends[group, columns] - counts[group, columns]
+    mask = masks[group, columns]
+    # Search for the square by halves of the mask
+    sq = np.zeros(len(self.games), dtype=np.uint64)
+    for width in (32, 16, 8, 4, 2, 1):
+      low = np.bitwise_count((mask >> sq) & np.uint64((1 << width) - 1))
+      high = index >= low
+      index -= np.where(high, low, 0)
+      sq += np.where(high, np.uint64(width), np.uint64(0))
+    ids = np.where(moving, _GROUP_IDS[group] | sq.astype(np.int64), -1)
+    chosen[self.games] = ids
+
+    # Move the piece, then the enemy for pushes and pulls
+    bb = self.bb
+    for side, fromSq, toSq in ((0, _OLD[ids], _NEW[ids]), (1, _OP_OLD[ids], _OP_NEW[ids])):
+      fromBit = np.where(moving, _bit(fromSq), np.uint64(0))
+      rank = ((bb[side] & fromBit) != 0).argmax(0)
+      bb[side, rank, columns] ^= fromBit | np.where(moving, _bit(toSq), np.uint64(0))
+    self.left -= np.where(moving, _LENGTH[ids], 0).astype(np.int8)
+    self.budget = np.where(moving, np.where(self.left == 0, 0, self.budget - 1), self.budget).astype(np.int8)
+
+    # Remove any piece on a trap without a friend next to it
+    occ = np.stack([union(bb[0]), union(bb[1])])
+    captured = occ & _TRAPS & ~adjacent(occ)
+    if captured.any():
+      bb &= ~captured[:, None, :]
+    return chosen
+
+  def play(self, snapshots: list[bytes]) -> np.ndarray:
+    """
+    Play a random game from each Board.snapshot to the end, and return the winners
+    """
+    self.load(snapshots)
+    while len(self.games) > 0:
+      self.step()
+    return self.winners
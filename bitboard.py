@@ -0,0 +1,229 @@
+from typing import Any, Generator
+
+from board import Board, Piece, Step, COLORS, RANKS, NEIGHBOR_MASK, GOAL_MASKS, STEP_TABLE, RABBIT_STEP_TABLE, \
+  ZOBRIST_PIECES
+from util import chance
+
+# Bit n of a mask is square n, so bit 0 is a8 and bit 63 is h1
+FULL = (1 << 64) - 1
+FILE_A = 0x0101010101010101 # x == 0
+FILE_H = FILE_A << 7 # x == 7
+NOT_FILE_A = FULL & ~FILE_A
+NOT_FILE_H = FULL & ~FILE_H
+
+def north(mask: int) -> int:
+  """
+  Shift a mask one row towards the top (y - 1)
+  """
+  return mask >> 8
+
+def south(mask: int) -> int:
+  """
+  Shift a mask one row towards the bottom (y + 1)
+  """
+  return (mask << 8) & FULL
+
+def east(mask: int) -> int:
+  """
+  Shift a mask one column to the right (x + 1)
+  """
+  return (mask & ~FILE_H) << 1
+
+def west(mask: int) -> int:
+  """
+  Shift a mask one column to the left (x - 1)
+  """
+  return (mask & ~FILE_A) >> 1
+
+def adjacent(mask: int) -> int:
+  """
+  Get every square next to a square in the mask
+  """
+  return north(mask) | south(mask) | east(mask) | west(mask)
+
+def squares(mask: int) -> Generator[int, Any, None]:
+  """
+  Iterate through the square numbers set in a mask
+  """
+  while mask:
+    low = mask & -mask
+    yield low.bit_length() - 1
+    mask ^= low
+
+class BitBoard(Board):
+  """
+  A board that also keeps one 64 bit mask per color and rank,
+    so freezing, traps and wins are checked with shifts and masks
+  Behaves exactly like Board, and can be used anywhere it is
+    The masks replace Board's piece sets and rabbit counts, which a BitBoard doesn't have
+  """
+  _bb: list[list[int]] # The squares of each piece, by color then rank
+  _occ: list[int] # The squares of each color's pieces
+
+  def _init_pieces(self):
+    """
+    Set up the masks for an empty board, instead of Board's piece sets and rabbit counts
+    """
+    self._bb = [[0] * 6, [0] * 6]
+    self._occ = [0, 0]
+
+  def _set(self, sq: int, piece: Piece | None):
+    """
+    Set the piece on a square, keeping the masks and Zobrist key up to date
+    """
+    bit = 1 << sq
+    old = self._data[sq]
+    if old != None:
+      self._hash ^= ZOBRIST_PIECES[old][sq]
+      self._bb[old >> 3][old & 7] ^= bit
+      self._occ[old >> 3] ^= bit
+    if piece != None:
+      self._hash ^= ZOBRIST_PIECES[piece][sq]
+      self._bb[piece >> 3][piece & 7] |= bit
+      self._occ[piece >> 3] |= bit
+    self._data[sq] = piece
+
+  def pieces(self):
+    for color in (COLORS.GOLD, COLORS.SILVER):
+      for sq in squares(self._occ[color]):
+        yield self._data[sq]
+
+  def _check_win(self) -> int | None:
+    """
+    Check if a player has won the game, in the same order as Board._check_win, with the rabbit masks
+    """
+    playerA = 1 - self.state.player # Player A is the player who just finished their turn
+    playerB = self.state.player # Player B is the player who's turn just started
+    rabbitsA = self._bb[playerA][RANKS.RABBIT]
+    rabbitsB = self._bb[playerB][RANKS.RABBIT]
+    if rabbitsA & GOAL_MASKS[playerA]:
+      return playerA
+    if rabbitsB & GOAL_MASKS[playerB]:
+      return playerB
+    if not rabbitsB:
+      return playerA
+    if not rabbitsA:
+      return playerB
+    if not self._has_step(playerB):
+      return playerA
+    return None
+
+  def _frozen(self, color: int) -> int:
+    """
+    Get the mask of a color's pieces that are frozen
+    """
+    occ = self._occ[color]
+    enemies = self._occ[1 - color]
+    # Only pieces with an enemy next to them and no friend next to them can be frozen,
+    # which is usually none of them, adjacent() is written out since this is called for every position
+    lonely = occ & ~((occ >> 8) | (occ << 8) | (occ & NOT_FILE_H) << 1 | (occ & NOT_FILE_A) >> 1) \
+      & ((enemies >> 8) | (enemies << 8) | (enemies & NOT_FILE_H) << 1 | (enemies & NOT_FILE_A) >> 1)
+    if not lonely:
+      return 0
+    mine = self._bb[color]
+    theirs = self._bb[1 - color]
+    frozen = 0
+    stronger = 0 # Enemy pieces stronger than the current rank
+    for rank in range(RANKS.ELEPHANT, RANKS.RABBIT - 1, -1):
+      if mine[rank] & lonely and stronger:
+        frozen |= mine[rank] & adjacent(stronger)
+      stronger |= theirs[rank]
+    return frozen & lonely
+
+  def _is_frozen(self, sq: int) -> bool:
+    """
+    Check if the piece on a square is frozen
+    """
+    piece = self._data[sq]
+    if piece == None:
+      # This shouldn't happen
+      return True
+    color = piece >> 3
+    rank = piece & 7
+    near = NEIGHBOR_MASK[sq]
+    if near & self._occ[color]:
+      return False
+    stronger = 0
+    for rank2 in range(rank + 1, RANKS.ELEPHANT + 1):
+      stronger |= self._bb[1 - color][rank2]
+    return near & stronger != 0
+
+  def possible_steps(self, discard: float = 0) -> Generator[Step, Any, None]:
+    """
+    Obtain all possible steps for the current player, in the same way as Board.possible_steps,
+      but with the frozen pieces found with masks
+    """
+    doneNormal = False
+    donePush = False
+    left = self.state.left
+    if left < 1:
+      return
+    data = self._data
+    player = self.state.player
+    movable = self._occ[player] & ~self._frozen(player)
+    rabbits = self._bb[player][RANKS.RABBIT]
+    rabbitTable = RABBIT_STEP_TABLE[player]
+    while movable:
+      low = movable & -movable
+      movable ^= low
+      sq = low.bit_length() - 1
+      rank = data[sq] & 7 # type: ignore
+      # Rabbits cannot move backwards
+      table = rabbitTable[sq] if rabbits & low else STEP_TABLE[sq]
+
+      for sq2, step, pushes, pulls in table:
+        enemy = data[sq2]
+        if enemy == None:
+          if discard <= 0 or not doneNormal or not chance(discard):
+            doneNormal = True
+            yield step
+        elif left > 1 and enemy >> 3 != player and rank > (enemy & 7):
+          for sq3, push in pushes:
+            if data[sq3] == None:
+              if discard <= 0 or not donePush or not chance(discard):
+                donePush = True
+                # Push the enemy onto a tile adjacent to them, then move to their old position
+                yield push
+          for sq3, pull in pulls:
+            if data[sq3] == None:
+              if discard <= 0 or not donePush or not chance(discard):
+                donePush = True
+                # Step into an adjacent tile, them pull the enemy to my old tile
+                yield pull
+
+  def _check_traps(self, step: Step | None = None):
+    """
+    Check if any piece is on a trap and unprotected, if so, remove it
+      If given the step that was just made, only the traps next to the squares it touched are checked
+    """
+    for sq in self._touched_traps(step):
+      bit = 1 << sq
+      for color in (COLORS.GOLD, COLORS.SILVER):
+        if self._occ[color] & bit and not self._occ[color] & NEIGHBOR_MASK[sq]:
+          self.history.add_trap(self._data[sq], sq) # type: ignore
+          self._set(sq, None)
+
+  def _has_step(self, color: int) -> bool:
+    """
+    Check if a color has at least one possible step, assuming it has at least two steps left
+    """
+    mine = self._bb[color]
+    empty = ~(self._occ[0] | self._occ[1]) & FULL
+    movable = self._occ[color] & ~self._frozen(color)
+    rabbits = mine[RANKS.RABBIT] & movable
+    # Rabbits can go sideways or forwards
+    forward = north if color == COLORS.GOLD else south
+    if (east(rabbits) | west(rabbits) | forward(rabbits)) & empty:
+      return True
+    others = movable & ~rabbits
+    if adjacent(others) & empty:
+      return True
+    # The only steps left are pushes, pulls need an empty square next to the piece
+    pushable = adjacent(empty)
+    weaker = 0
+    theirs = self._bb[1 - color]
+    for rank in range(RANKS.RABBIT, RANKS.ELEPHANT + 1):
+      if adjacent(mine[rank] & movable) & weaker & pushable:
+        return True
+      weaker |= theirs[rank]
+    return False
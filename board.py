@@ -1,4 +1,6 @@
+import os
 import random
+from array import array
 from typing import Any, Generator, NewType, TypeVar
 
 from util import chance
@@ -125,6 +127,21 @@ class State:
     self.player = int(p)
     self.left = int(l)
 
+  def pack(self) -> int:
+    """
+    Pack this state into a single byte
+    """
+    return (self.setup << 5) | (self.end << 4) | (self.player << 3) | (self.left + 1)
+
+  def unpack(self, val: int):
+    """
+    Read a byte from State.pack and set this state to match it
+    """
+    self.setup = val & 32 != 0
+    self.end = val & 16 != 0
+    self.player = (val >> 3) & 1
+    self.left = (val & 7) - 1
+
 # A position on the board
 Pos = NewType('Pos', tuple[int, int])
 
@@ -161,6 +178,42 @@ def all_positions() -> Generator[Pos, Any, Any]:
     for j in range(8):
       yield (i, j) # type: ignore
 
+# The position of every square number, squares are numbered y * 8 + x
+SQUARE_POS: list[Pos] = [(sq & 7, sq >> 3) for sq in range(64)] # type: ignore
+
+def square(pos: Pos) -> int:
+  """
+  Get the number of the square at a position
+  """
+  x, y = pos
+  return y * 8 + x
+
+# The board geometry, worked out once so the board never has to build positions while playing
+# The neighbors of each square, in the same order as neighbors()
+NEIGHBORS: list[tuple[int, ...]] = [tuple(square(pos2) for pos2 in neighbors(pos)) for pos in SQUARE_POS]
+# The neighbors a rabbit can move to, by color then square, since rabbits cannot move backwards
+RABBIT_NEIGHBORS: list[list[tuple[int, ...]]] = [
+  [tuple(square(pos2) for pos2 in neighbors(pos, 1)) for pos in SQUARE_POS],
+  [tuple(square(pos2) for pos2 in neighbors(pos, -1)) for pos in SQUARE_POS]
+]
+# The same neighbors as bit masks, bit n is square n
+NEIGHBOR_MASK = [sum(1 << sq2 for sq2 in NEIGHBORS[sq]) for sq in range(64)]
+RABBIT_MASK = [[sum(1 << sq2 for sq2 in RABBIT_NEIGHBORS[color][sq]) for sq in range(64)] for color in range(2)]
+# The row each color's rabbits need to reach, as a mask
+GOAL_MASKS = [0xFF, 0xFF << 56]
+
+# The locations of the traps
+TRAPS: list[Pos] = [(2, 2), (2, 5), (5, 2), (5, 5)] # type: ignore
+TRAP_SQUARES = [square(trap) for trap in TRAPS]
+# For each square, the traps that are on or next to it, as bits in the order of TRAPS
+TRAP_NEAR = [sum(1 << i for i, trap in enumerate(TRAP_SQUARES) if trap == sq or trap in NEIGHBORS[sq])
+             for sq in range(64)]
+# The trap squares for each combination of bits from TRAP_NEAR
+TRAP_SUBSETS: list[list[int]] = [[TRAP_SQUARES[i] for i in range(4) if bits >> i & 1] for bits in range(16)]
+
+# The order of the squares in Board.encode
+ENCODE_ORDER = [square(pos) for pos in all_positions()]
+
 def pos_str(pos: Pos):
     x, y = pos
     return chr(x + 97) + str(8 - y)
@@ -170,46 +223,167 @@ Self = TypeVar("Self", bound="Step")
 class Step:
   """
   Represents a single step
+    Every possible step is built once when the module loads and kept in STEPS,
+    so steps are never allocated while playing and can be passed around as their id
   """
+  __slots__ = ("id", "oldPos", "newPos", "opOldPos", "opNewPos",
+               "oldSq", "newSq", "opOldSq", "opNewSq", "length", "traps")
+  id: int # The number of this step, its index in STEPS
   oldPos: Pos # The old position of the piece
   newPos: Pos # The new position of the piece
   opOldPos: Pos | None # The old position of the enemy piece
   opNewPos: Pos | None # The new position of the enemy piece
+  oldSq: int # The same positions as square numbers, -1 if there is no enemy piece
+  newSq: int
+  opOldSq: int
+  opNewSq: int
+  length: int # The number of steps this takes from a turn, 2 for pushes and pulls
+  traps: list[int] # The traps on or next to the squares this step touches
+
+  def __init__(self, id: int, oldSq: int, newSq: int, opOldSq: int = -1, opNewSq: int = -1) -> None:
+    self.id = id
+    self.oldSq = oldSq
+    self.newSq = newSq
+    self.opOldSq = opOldSq
+    self.opNewSq = opNewSq
+    self.oldPos = SQUARE_POS[oldSq]
+    self.newPos = SQUARE_POS[newSq]
+    self.opOldPos = SQUARE_POS[opOldSq] if opOldSq != -1 else None
+    self.opNewPos = SQUARE_POS[opNewSq] if opNewSq != -1 else None
+    self.length = 1 if opOldSq == -1 else 2
+    near = TRAP_NEAR[oldSq] | TRAP_NEAR[newSq]
+    if opOldSq != -1:
+      near |= TRAP_NEAR[opOldSq] | TRAP_NEAR[opNewSq]
+    self.traps = TRAP_SUBSETS[near]
 
   @staticmethod
   def create(oldPos: Pos, newPos: Pos) -> Self: # type: ignore
     """
-    Create a step with no push or pull
+    Get the step with no push or pull
     """
-    move = Step()
-    move.oldPos = oldPos
-    move.newPos = newPos
-    move.opOldPos = None
-    move.opNewPos = None
-    return move # type: ignore
+    return Step.find(oldPos, newPos, None, None) # type: ignore
   
   @staticmethod
   def create_push(oldPos: Pos, newPos: Pos, opOldPos: Pos, opNewPos: Pos) -> Self: # type: ignore
     """
-    Create a step that has a push or pull
+    Get the step that has a push or pull
+    """
+    return Step.find(oldPos, newPos, opOldPos, opNewPos) # type: ignore
+
+  @staticmethod
+  def find(oldPos: Pos, newPos: Pos, opOldPos: Pos | None, opNewPos: Pos | None) -> Self: # type: ignore
     """
-    move = Step()
-    move.oldPos = oldPos
-    move.newPos = newPos
-    move.opOldPos = opOldPos
-    move.opNewPos = opNewPos
-    return move # type: ignore
+    Look up the step between the given positions
+    """
+    for pos in (oldPos, newPos, opOldPos, opNewPos):
+      if pos != None and not in_bounds(pos):
+        raise ValueError("Not a possible step")
+    key = (square(oldPos), square(newPos),
+           square(opOldPos) if opOldPos != None else -1, square(opNewPos) if opNewPos != None else -1)
+    if key not in _STEPS_BY_SQUARES:
+      raise ValueError("Not a possible step")
+    return _STEPS_BY_SQUARES[key] # type: ignore
+
+# The directions a piece can step in, in the same order as neighbors()
+DIRECTIONS = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+# The letters for each direction in step notation
+DirectionChars = ["e", "w", "s", "n"]
+# The direction for each difference between square numbers
+SQUARE_DIRECTIONS = {dx + dy * 8: i for i, (dx, dy) in enumerate(DIRECTIONS)}
+
+class STEP_KINDS:
+  """
+  Constants for the kinds of steps
+  """
+  NORMAL = 0
+  PUSH = 1 # The enemy is on the new square and is pushed in another direction
+  PULL = 2 # The enemy is next to the old square and is pulled into it
+
+def step_id(oldSq: int, dir: int, kind: int = STEP_KINDS.NORMAL, opDir: int = 0) -> int:
+  """
+  Get the id of a step from the square it starts on and the directions involved
+    Bits 0-5 are the square, 6-7 the direction, 8-9 the kind and 10-11 the enemy's direction
+    For pushes the enemy's direction is the way it is pushed, for pulls it is where the enemy is
+  """
+  return oldSq | (dir << 6) | (kind << 8) | (opDir << 10)
+
+def _offset(sq: int, dir: int) -> int:
+  """
+  Get the square next to a square in a direction, or -1 if it is off the board
+  """
+  dx, dy = DIRECTIONS[dir]
+  x, y = SQUARE_POS[sq]
+  if not in_bounds((x + dx, y + dy)): # type: ignore
+    return -1
+  return (y + dy) * 8 + x + dx
+
+# Every possible step by id, None for ids that aren't a step
+STEPS: list[Step | None] = [None] * 4096
+for _sq in range(64):
+  for _dir in range(4):
+    _sq2 = _offset(_sq, _dir)
+    if _sq2 == -1:
+      continue
+    STEPS[step_id(_sq, _dir)] = Step(step_id(_sq, _dir), _sq, _sq2)
+    for _opDir in range(4):
+      _sq3 = _offset(_sq2, _opDir)
+      if _sq3 != -1 and _sq3 != _sq:
+        _id = step_id(_sq, _dir, STEP_KINDS.PUSH, _opDir)
+        STEPS[_id] = Step(_id, _sq, _sq2, _sq2, _sq3)
+      _sq3 = _offset(_sq, _opDir)
+      if _sq3 != -1 and _sq3 != _sq2:
+        _id = step_id(_sq, _dir, STEP_KINDS.PULL, _opDir)
+        STEPS[_id] = Step(_id, _sq, _sq2, _sq3, _sq)
+# Steps by the squares they use
+_STEPS_BY_SQUARES = {(step.oldSq, step.newSq, step.opOldSq, step.opNewSq): step for step in STEPS if step != None}
+
+# For each square, a tuple for each neighbor of
+#   (neighbor, step there, pushes of a piece there as (square, step), pulls of a piece there as (square, step))
+# Used by possible_steps to find steps without building anything
+STEP_TABLE: list[tuple[tuple[int, Step, tuple[tuple[int, Step], ...], tuple[tuple[int, Step], ...]], ...]] = []
+# The same, without the backwards neighbor for rabbits of each color
+RABBIT_STEP_TABLE: list[list[tuple[tuple[int, Step, tuple[tuple[int, Step], ...], tuple[tuple[int, Step], ...]], ...]]] = [[], []]
+for _sq in range(64):
+  _entries = []
+  for _dir in range(4):
+    _sq2 = _offset(_sq, _dir)
+    if _sq2 == -1:
+      continue
+    _pushes = tuple((_offset(_sq2, _opDir), STEPS[step_id(_sq, _dir, STEP_KINDS.PUSH, _opDir)])
+                    for _opDir in range(4) if STEPS[step_id(_sq, _dir, STEP_KINDS.PUSH, _opDir)] != None)
+    # The enemy is at _sq2 and is pulled as the piece steps to any other empty neighbor
+    _pulls = tuple((_offset(_sq, _dir2), STEPS[step_id(_sq, _dir2, STEP_KINDS.PULL, _dir)])
+                   for _dir2 in range(4) if STEPS[step_id(_sq, _dir2, STEP_KINDS.PULL, _dir)] != None)
+    _entries.append((_sq2, STEPS[step_id(_sq, _dir)], _pushes, _pulls))
+  STEP_TABLE.append(tuple(_entries)) # type: ignore
+  for _color in (COLORS.GOLD, COLORS.SILVER):
+    RABBIT_STEP_TABLE[_color].append(tuple(entry for entry in _entries if entry[0] in RABBIT_NEIGHBORS[_color][_sq])) # type: ignore
+
+def as_step(step: "Step | int") -> Step:
+  """
+  Get the Step object for a step given as either a Step or its id
+  """
+  if type(step) is int:
+    return STEPS[step] # type: ignore
+  return step # type: ignore
   
 Move = tuple[Step] | tuple[Step, Step] | tuple[Step, Step, Step] | tuple[Step, Step, Step, Step]
 
 def move_len(move: Move):
   count = 0
   for step in move:
-    count += 1
-    if step.opOldPos != None:
-      count += 1
+    count += as_step(step).length
   return count
 
+# Random keys for Zobrist hashing, seeded so every process agrees on them
+_zobristRandom = random.Random(440)
+# The key for each piece on each square, indexed by piece then y * 8 + x
+ZOBRIST_PIECES = [[_zobristRandom.getrandbits(64) for _ in range(64)] for _ in range(16)]
+# The key for the player to move and how many steps they have left (-1 to 4)
+ZOBRIST_TURN = [[_zobristRandom.getrandbits(64) for _ in range(6)] for _ in range(2)]
+ZOBRIST_SETUP = _zobristRandom.getrandbits(64) # Included while the players are placing pieces
+ZOBRIST_END = _zobristRandom.getrandbits(64) # Included once the game is over
+
 class StateException(Exception):
   """
   Raised when a given action is invalid given the state of the board
@@ -217,124 +391,163 @@ class StateException(Exception):
   pass
 
 class Event:
+  """
+  A single event in the history, unpacked from History.events for reading
+  """
   class Type:
-    Move = "MOVE"
-    Trap = "TRAP"
-    Turn = "TURN"
-    End = "END"
+    Move = 0
+    Trap = 1
+    Turn = 2
+    End = 3
 
-  type: str
+  type: int
   piece: Piece
   player: int
   count: int
   pos1: Pos
   pos2: Pos
-    
+
+  @staticmethod
+  def unpack(record: int) -> "Event":
+    """
+    Read a record packed by History
+    """
+    event = Event()
+    event.type = record & 3
+    event.piece = (record >> 2) & 15 # type: ignore
+    event.pos1 = SQUARE_POS[(record >> 6) & 63]
+    event.pos2 = SQUARE_POS[(record >> 12) & 63]
+    event.player = (record >> 18) & 1
+    event.count = (record >> 19) & 7
+    if event.type == Event.Type.Move or event.type == Event.Type.Trap:
+      event.player, _ = parse_piece(event.piece)
+    return event
+
+# Names of the event types
+EventNames = ["MOVE", "TRAP", "TURN", "END"]
 
 class History:
-  events: list[Event] = []
+  """
+  The events of one board, packed into integers so undoing is cheap
+    Bits 0-1 are the type, 2-5 the piece, 6-11 and 12-17 the squares,
+    18 the player and 19-21 the steps left
+  """
+  events: array
 
-  def add_move(self, piece: Piece, oldPos: Pos, newPos: Pos):
-    event = Event()
-    event.type = Event.Type.Move
-    event.piece = piece
-    event.player,_ = parse_piece(piece)
-    event.pos1 = oldPos
-    event.pos2 = newPos
-    self.events.append(event)
-
-  def add_trap(self, piece: Piece, pos: Pos):
-    event = Event()
-    event.type = Event.Type.Trap
-    event.piece = piece
-    event.player,_ = parse_piece(piece)
-    event.pos1 = pos
-    self.events.append(event)
+  def __init__(self) -> None:
+    self.events = array("I")
+
+  def add_move(self, piece: Piece, oldSq: int, newSq: int):
+    self.events.append(Event.Type.Move | (piece << 2) | (oldSq << 6) | (newSq << 12))
+
+  def add_trap(self, piece: Piece, sq: int):
+    self.events.append(Event.Type.Trap | (piece << 2) | (sq << 6))
 
   def add_turn(self, player: int, left: int):
-    event = Event()
-    event.type = Event.Type.Turn
-    event.player = player
-    event.count = left
-    self.events.append(event)
+    self.events.append(Event.Type.Turn | (player << 18) | (left << 19))
 
   def add_end(self):
-    event = Event()
-    event.type = Event.Type.End
-    self.events.append(event)
-
-  def _undo_event(self, event: Event, board):
-    if event.type == Event.Type.Move:
-      if board[event.pos2] == event.piece:
-        board[event.pos2] = None
-      board[event.pos1] = event.piece
+    self.events.append(Event.Type.End)
+
+  def _undo_event(self, record: int, board):
+    type = record & 3
+    if type == Event.Type.Move:
+      piece = (record >> 2) & 15
+      newSq = (record >> 12) & 63
+      if board._data[newSq] == piece:
+        board._set(newSq, None)
+      board._set((record >> 6) & 63, piece)
       board.state.left += 1
-    elif event.type == Event.Type.Trap:
-      board[event.pos1] = event.piece
-    elif event.type == Event.Type.Turn:
-      board.state.player = event.player
-      board.state.left = event.count
-    elif event.type == Event.Type.End:
+    elif type == Event.Type.Trap:
+      board._set((record >> 6) & 63, (record >> 2) & 15)
+    elif type == Event.Type.Turn:
+      board.state.player = (record >> 18) & 1
+      board.state.left = (record >> 19) & 7
+    elif type == Event.Type.End:
       board.state.end = False
 
   def undo(self, board):
     if len(self.events) > 0:
-      event = self.events.pop()
-      self._undo_event(event, board)
+      self._undo_event(self.events.pop(), board)
 
   def undo_step(self, board):
-    while len(self.events) > 0:
-      event = self.events.pop()
-      self._undo_event(event, board)
+    events = self.events
+    while len(events) > 0:
+      record = events.pop()
+      self._undo_event(record, board)
       # If event moves the player's piece, then this is the first event of the step, so stop
-      if event.type == Event.Type.Move and event.player == board.state.player:
+      if record & 3 == Event.Type.Move and (record >> 5) & 1 == board.state.player:
         break
 
+  def undo_turn(self, board):
+    """
+    Undo finish_turn(), leaving the steps of the turn in place
+    """
+    record = self.events.pop()
+    self._undo_event(record, board)
+    if record & 3 == Event.Type.End:
+      self._undo_event(self.events.pop(), board)
+
   def undo_move(self, board):
-    event = self.events.pop()
-    self._undo_event(event, board)
-    if event.type == Event.Type.End:
-      event = self.events.pop()
-      self._undo_event(event, board)
-    player = event.player
-    while len(self.events) > 0:
-      event = self.events.pop()
-      # We undo until we find the end of the previous turn
-      if event.type == Event.Type.Turn and event.player == 1 - player:
+    events = self.events
+    record = events.pop()
+    self._undo_event(record, board)
+    if record & 3 == Event.Type.End:
+      record = events.pop()
+      self._undo_event(record, board)
+    player = (record >> 18) & 1
+    while len(events) > 0:
+      # We undo until we find the end of the previous turn, which stays in the history
+      record = events[-1]
+      if record & 3 == Event.Type.Turn and (record >> 18) & 1 == 1 - player:
         break
-      self._undo_event(event, board)
+      self._undo_event(events.pop(), board)
+
+  def truncate(self, count: int):
+    """
+    Forget every event after the first count, without undoing them
+    """
+    del self.events[count:]
 
   def clear(self):
-    self.events.clear()
+    del self.events[:]
 
   def print(self, last = None):
     count = len(self.events)
     if last != None:
       count = last
     print("History: Last", count, "events:")
-    for event in self.events[-count:]:
+    for record in self.events[len(self.events) - count:]:
+      event = Event.unpack(record)
+      name = EventNames[event.type]
       if event.type == Event.Type.Move:
-        print(event.type, piece_to_char(event.piece), "moves from", pos_str(event.pos1), "to", pos_str(event.pos2))
+        print(name, piece_to_char(event.piece), "moves from", pos_str(event.pos1), "to", pos_str(event.pos2))
       elif event.type == Event.Type.Trap:
-        print(event.type, piece_to_char(event.piece), "trapped at", pos_str(event.pos1))
+        print(name, piece_to_char(event.piece), "trapped at", pos_str(event.pos1))
       elif event.type == Event.Type.Turn:
-        print(event.type, ColorNames[event.player], "passed", event.count, "steps left")
+        print(name, ColorNames[event.player], "passed", event.count, "steps left")
       elif event.type == Event.Type.End:
-        print(event.type)
+        print(name)
       
 class Board:
   """
   Represents a board of Arimaa, including the current game state
   """
-  _data: list[list[Piece | None]] # The pieces on the board None means empty
+  _data: list[Piece | None] # The pieces on each square of the board, None means empty
   state: State # The state of the game
   history: History # The history of the game
+  _hash: int # The Zobrist key of the pieces, kept up to date by _set
+  _rabbits: list[int] # The number of rabbits each color has
+  _goalRabbits: list[int] # The number of rabbits each color has on its goal row
+  _pieces: list[set[int]] # The squares of each color's pieces
 
   # The locations of the traps
-  TRAPS: list[Pos] = [(2, 2), (2, 5), (5, 2), (5, 5)] # type: ignore
+  TRAPS: list[Pos] = TRAPS
 
   def __init__(self) -> None:
-    self._data = []
+    self._data = [None] * 64
+    self._hash = 0
+    self._init_pieces()
     self.state = State()
     self.history = History()
     # At the start, the gold player places their starting pieces
@@ -342,12 +555,6 @@ class Board:
     self.state.end = False
     self.state.player = COLORS.GOLD
     self.state.left = -1
-    # Initialize the empty board
-    for _ in range(8):
-      inner = []
-      for _ in range(8):
-        inner.append(None)
-      self._data.append(inner)
 
   def place_initial(self, player: int, pieces: list[list[int]]):
     """
@@ -365,10 +572,10 @@ class Board:
       for j in range(8):
         if player == COLORS.SILVER:
           # The silver player has their front line at 1 and back line at 0
-          self._data[i][j] = make_piece(player, pieces[-(i + 1)][j])
+          self[j, i] = make_piece(player, pieces[-(i + 1)][j]) # type: ignore
         elif player == COLORS.GOLD:
           # The gold player has their front line at 6 (-2) and back line at 7 (-1)
-          self._data[-(i + 1)][j] = make_piece(player, pieces[-(i + 1)][j])
+          self[j, 7 - i] = make_piece(player, pieces[-(i + 1)][j]) # type: ignore
     # If the gold player just placed, it's now the silver player's turn to place
     if self.state.player == COLORS.GOLD:
       self.state.player = COLORS.SILVER
@@ -383,41 +590,93 @@ class Board:
     Get a piece at the given position
     """
     x, y = pos
-    return self._data[y][x]
-  
+    return self._data[y * 8 + x]
+
   def __setitem__(self, pos: Pos, piece: Piece | None):
     """
     Set the piece at the given position
     """
     x, y = pos
-    self._data[y][x] = piece
+    self._set(y * 8 + x, piece)
+
+  def _init_pieces(self):
+    """
+    Set up the piece locations and rabbit counts that _set keeps up to date, for an empty board
+      BitBoard replaces them with its masks, so they only exist on a Board
+    """
+    self._rabbits = [0, 0]
+    self._goalRabbits = [0, 0]
+    self._pieces = [set(), set()]
+
+  def _set(self, sq: int, piece: Piece | None):
+    """
+    Set the piece on a square, every change to the board goes through here
+      Keeps the Zobrist key, piece locations and rabbit counts up to date
+    """
+    old = self._data[sq]
+    if old != None:
+      self._hash ^= ZOBRIST_PIECES[old][sq]
+      self._pieces[old >> 3].discard(sq)
+      if old & 7 == RANKS.RABBIT:
+        color = old >> 3
+        self._rabbits[color] -= 1
+        if GOAL_MASKS[color] >> sq & 1:
+          self._goalRabbits[color] -= 1
+    if piece != None:
+      self._hash ^= ZOBRIST_PIECES[piece][sq]
+      self._pieces[piece >> 3].add(sq)
+      if piece & 7 == RANKS.RABBIT:
+        color = piece >> 3
+        self._rabbits[color] += 1
+        if GOAL_MASKS[color] >> sq & 1:
+          self._goalRabbits[color] += 1
+    self._data[sq] = piece
+
+  def zobrist(self) -> int:
+    """
+    Get a 64 bit key that identifies the position, including whose turn it is and how many steps they have left
+      The pieces are hashed incrementally as they move, so this is O(1)
+    """
+    state = self.state
+    key = self._hash ^ ZOBRIST_TURN[state.player][state.left + 1]
+    if state.setup:
+      key ^= ZOBRIST_SETUP
+    if state.end:
+      key ^= ZOBRIST_END
+    return key
 
   def __iter__(self):
     """
     Iterate through all the pieces
     """
-    return (piece for row in self._data for piece in row)
+    return iter(self._data)
 
-  def do_step(self, step: Step):
+  def do_step(self, step: Step | int):
     """
-    Execute a single step and modify the state as needed
+    Execute a single step, given as a Step or its id, and modify the state as needed
     """
     if self.state.left < 1:
       raise StateException("Current player has no steps left.")
-    toMove = self[step.oldPos]
+    step = as_step(step)
+    data = self._data
+    oldSq = step.oldSq
+    newSq = step.newSq
+    toMove = data[oldSq]
     if toMove == None:
       raise StateException("No piece at starting location.")
     color, rank = parse_piece(toMove)
     if color != self.state.player:
       raise StateException("Cannot move opponent's pieces.")
-    if self.is_frozen(step.oldPos):
+    if self._is_frozen(oldSq):
       raise StateException("Cannot move a frozen piece.")
 
     enemy = None
-    if step.opOldPos != None:
+    opOldSq = step.opOldSq
+    opNewSq = step.opNewSq
+    if opOldSq != -1:
       if self.state.left < 2:
         raise StateException("Pushs or pulls require 2 steps")
-      enemy = self[step.opOldPos]
+      enemy = data[opOldSq]
       if enemy == None:
         raise StateException("No piece at enemy location.")
       opColor, opRank = parse_piece(enemy)
@@ -427,27 +686,41 @@ class Board:
         raise StateException("Cannot push or pull higher rank pieces.")
 
     # You can move on top of a piece if you're pushing it
-    if self[step.newPos] != None and step.newPos != step.opOldPos:
+    if data[newSq] != None and newSq != opOldSq:
       raise StateException("Cannot move on top of another piece.")
-    
+
     # You can move an enemy on top of your piece if you're pulling it
-    if step.opNewPos != None and self[step.opNewPos] != None and step.oldPos != step.opNewPos:
+    if enemy != None and data[opNewSq] != None and oldSq != opNewSq:
       raise StateException("Cannot push a piece on top of another piece.")
-    
-    self[step.oldPos] = None
-    if step.opOldPos != None:
-      self[step.opOldPos] = None
-    self[step.newPos] = toMove
-    self.state.left -= 1
-    self.history.add_move(toMove, step.oldPos, step.newPos)
-    if step.opNewPos != None:
-      if self.state.left < 1:
-        raise StateException("Current player has no steps left.")
-      self[step.opNewPos] = enemy
-      self.state.left -= 1
-      self.history.add_move(enemy, step.opOldPos, step.opNewPos) # type: ignore
 
-    self._check_traps()
+    self.apply_step(step)
+
+  def apply_step(self, step: Step | int):
+    """
+    Execute a single step without checking that it is legal
+      Only for steps that possible_steps just gave for this position, use do_step for anything else
+    """
+    step = as_step(step)
+    data = self._data
+    oldSq = step.oldSq
+    newSq = step.newSq
+    toMove = data[oldSq]
+    opOldSq = step.opOldSq
+    self._set(oldSq, None)
+    if opOldSq == -1:
+      self._set(newSq, toMove)
+      self.state.left -= 1
+      self.history.add_move(toMove, oldSq, newSq) # type: ignore
+    else:
+      enemy = data[opOldSq]
+      self._set(opOldSq, None)
+      self._set(newSq, toMove)
+      self._set(step.opNewSq, enemy)
+      self.state.left -= 2
+      self.history.add_move(toMove, oldSq, newSq) # type: ignore
+      self.history.add_move(enemy, opOldSq, step.opNewSq) # type: ignore
+
+    self._check_traps(step)
 
   def do_move(self, move: Move):
     if self.state.left < move_len(move):
@@ -456,6 +729,15 @@ class Board:
       self.do_step(step)
     self.finish_turn()
 
+  def apply_move(self, move: Move):
+    """
+    Make a move and finish the turn without checking that it is legal
+      Only for moves that were just generated for this position, like from random_move
+    """
+    for step in move:
+      self.apply_step(step)
+    self.finish_turn()
+
   def finish_turn(self):
     """
     Finish the current turn and start the next player's turn
@@ -478,146 +760,152 @@ class Board:
     Iterate through all the pieces on the board
       Unlike __iter__(), this skips the empty spaces
     """
-    for piece in self:
-      if piece != None:
-        yield piece
+    for color in (COLORS.GOLD, COLORS.SILVER):
+      for sq in self._pieces[color]:
+        yield self._data[sq]
   
-  def _check_traps(self):
+  def _check_traps(self, step: Step | None = None):
     """
     Check if any piece is on a trap and unprotected, if so, remove it
+      If given the step that was just made, only the traps next to the squares it touched are checked,
+      since no other trap can have changed
     """
-    for trap in self.TRAPS:
-      piece = self[trap]
+    data = self._data
+    for trap in self._touched_traps(step):
+      piece = data[trap]
       if piece != None:
-        color, _ = parse_piece(piece)
-        safe = False
-        for pos in neighbors(trap):
-          friend = self[pos]
-          if friend != None:
-            c, _ = parse_piece(friend)
-            if color == c:
-              safe = True
-              break
-        if not safe:
+        color = piece >> 3
+        for sq in NEIGHBORS[trap]:
+          friend = data[sq]
+          if friend != None and friend >> 3 == color:
+            break
+        else:
           self.history.add_trap(piece, trap)
-          self[trap] = None
+          self._set(trap, None)
+
+  def _touched_traps(self, step: Step | None) -> list[int]:
+    """
+    Get the trap squares on or next to the squares a step touched, or all of them if there is no step
+    """
+    if step == None:
+      return TRAP_SQUARES
+    return step.traps
 
   def _check_win(self) -> int | None:
     """
     Check if a player has won the game
+      The rabbit counts are kept up to date by _set, so only the mobility check looks at the board
     """
-    def check_end(player: int):
-      """
-      Check if a player has brought their rabbit to the opposite side of the board
-      """
-      for piece in self._data[0 if player == COLORS.GOLD else -1]:
-        if piece != None:
-          color, rank = parse_piece(piece)
-          if color == player and rank == RANKS.RABBIT:
-            return player
-      return None
-    
-    def check_rabbits(player: int):
-      """
-      Check if a player is out of rabbits
-      """
-      for piece in self.pieces():
-        color, rank = parse_piece(piece)
-        if color == player and rank == RANKS.RABBIT:
-          return None
-      return 1 - player
-    
     playerA = 1 - self.state.player # Player A is the player who just finished their turn
     playerB = self.state.player # Player B is the player who's turn just started
-    win = check_end(playerA)
-    if win != None:
-      return win
-    win = check_end(playerB)
-    if win != None:
-      return win
-    win = check_rabbits(playerB)
-    if win != None:
-      return win
-    win = check_rabbits(playerA)
-    if win != None:
-      return win
+    # Check if a player has brought their rabbit to the opposite side of the board
+    if self._goalRabbits[playerA] > 0:
+      return playerA
+    if self._goalRabbits[playerB] > 0:
+      return playerB
+    # Check if a player is out of rabbits
+    if self._rabbits[playerB] == 0:
+      return playerA
+    if self._rabbits[playerA] == 0:
+      return playerB
     
     # If the current player has no possible moves, their opponent wins
-    if not any(self.possible_steps()):
-      return 1 - self.state.player
+    if not self._has_step(playerB):
+      return playerA
     
     return None
-  
+
+  def _has_step(self, color: int) -> bool:
+    """
+    Check if a color has at least one possible step, assuming it has at least two steps left
+      Stops at the first step found, without building any steps
+    """
+    data = self._data
+    for sq in self._pieces[color]:
+      if self._is_frozen(sq):
+        continue
+      rank = data[sq] & 7 # type: ignore
+      # Rabbits cannot move backwards
+      targets = RABBIT_NEIGHBORS[color][sq] if rank == RANKS.RABBIT else NEIGHBORS[sq]
+      for sq2 in targets:
+        enemy = data[sq2]
+        if enemy == None:
+          return True
+        # Pulling needs an empty square next to the piece, which would already be a step,
+        # so only pushes are left
+        if enemy >> 3 != color and (enemy & 7) < rank:
+          for sq3 in NEIGHBORS[sq2]:
+            if data[sq3] == None:
+              return True
+    return False
+
   def is_frozen(self, pos: Pos) -> bool:
     """
     Check if a piece is frozen, which happens when a stronger piece is adjacent to it
     """
-    piece = self[pos]
+    return self._is_frozen(square(pos))
+
+  def _is_frozen(self, sq: int) -> bool:
+    """
+    Check if the piece on a square is frozen
+    """
+    data = self._data
+    piece = data[sq]
     if piece == None:
       # This shouldn't happen
       return True
-    color, rank = parse_piece(piece)
+    color = piece >> 3
+    rank = piece & 7
     frozen = False
-    helped = False
-    for pos2 in neighbors(pos):
-      friend = self[pos2]
-      if friend == None:
-        continue
-      color2, rank2 = parse_piece(friend)
-      if color != color2 and rank2 > rank:
-        frozen = True
-      if color == color2:
-        helped = True
-    return frozen and not helped
-  
+    for sq2 in NEIGHBORS[sq]:
+      other = data[sq2]
+      if other != None:
+        if other >> 3 == color:
+          # A friendly piece next to it keeps it from being frozen
+          return False
+        if (other & 7) > rank:
+          frozen = True
+    return frozen
+
   def possible_steps(self, discard: float = 0) -> Generator[Step, Any, None]:
     """
     Obtain all possible steps for the current player
     """
     doneNormal = False
     donePush = False
-    if self.state.left < 1:
+    left = self.state.left
+    if left < 1:
       return
-    for pos in all_positions():
-      piece = self[pos]
-      if piece == None:
-        continue
-      if self.is_frozen(pos): # Cannot move if frozen
-        continue
-
-      color, rank = parse_piece(piece)
-      if color != self.state.player:
+    data = self._data
+    player = self.state.player
+    # Copied because the caller may make steps while this generator is paused
+    for sq in tuple(self._pieces[player]):
+      if self._is_frozen(sq): # Cannot move if frozen
         continue
 
+      rank = data[sq] & 7 # type: ignore
       # Rabbits cannot move backwards
-      exclude = None
-      if rank == RANKS.RABBIT:
-        if color == COLORS.GOLD:
-          exclude = 1
-        if color == COLORS.SILVER:
-          exclude = -1
-
-      for pos2 in neighbors(pos, exclude):
-        enemy = self[pos2]
+      table = RABBIT_STEP_TABLE[player][sq] if rank == RANKS.RABBIT else STEP_TABLE[sq]
+
+      for sq2, step, pushes, pulls in table:
+        enemy = data[sq2]
         if enemy == None:
           if discard <= 0 or not doneNormal or not chance(discard):
             doneNormal = True
-            yield Step.create(pos, pos2)
-        elif self.state.left > 1:
-          color2, rank2 = parse_piece(enemy)
-          if color != color2 and rank > rank2:
-            for pos3 in neighbors(pos2):
-              if self[pos3] == None:
-                if discard <= 0 or not donePush or not chance(discard):
-                  donePush = True
-                  # Push the enemy onto a tile adjacent to them, then move to their old position
-                  yield Step.create_push(pos, pos2, pos2, pos3)
-            for pos3 in neighbors(pos):
-              if self[pos3] == None:
-                if discard <= 0 or not donePush or not chance(discard):
-                  donePush = True
-                  # Step into an adjacent tile, them pull the enemy to my old tile
-                  yield Step.create_push(pos, pos3, pos2, pos)
+            yield step
+        elif left > 1 and enemy >> 3 != player and rank > (enemy & 7):
+          for sq3, push in pushes:
+            if data[sq3] == None:
+              if discard <= 0 or not donePush or not chance(discard):
+                donePush = True
+                # Push the enemy onto a tile adjacent to them, then move to their old position
+                yield push
+          for sq3, pull in pulls:
+            if data[sq3] == None:
+              if discard <= 0 or not donePush or not chance(discard):
+                donePush = True
+                # Step into an adjacent tile, them pull the enemy to my old tile
+                yield pull
 
   def possible_moves(self, discard: float = 0) -> Generator[Move, Any, None]:
     """
@@ -633,7 +921,7 @@ class Board:
       if self.state.left == 0:
         return
       for step in self.possible_steps(discard):
-        self.do_step(step)
+        self.apply_step(step)
         yield from expand(existing + [step])
         self.finish_turn()
         yield tuple(existing + [step]) #type: ignore
@@ -641,15 +929,75 @@ class Board:
 
     yield from expand([])
 
+  def unique_moves(self, discard: float = 0) -> Generator[Move, Any, None]:
+    """
+    Obtain the possible moves for the current player, but only one for each resulting position.
+      Orders of steps that reach a position that was already expanded are skipped along with everything after them,
+        and positions are told apart by their Zobrist key.
+      Unlike possible_moves, the board is left as it was whenever a move is yielded.
+    """
+    expanded: set[int] = set() # Positions in the middle of the turn that were already expanded
+    finished: set[int] = set() # Pieces at the end of the moves that were already yielded
+    path: list[Step] = []
+
+    def expand() -> Generator[Move, Any, None]:
+      for step in self.possible_steps(discard):
+        self.apply_step(step)
+        path.append(step)
+        if self._hash not in finished:
+          finished.add(self._hash)
+          # Take the steps back while the caller has the move
+          for _ in path:
+            self.undo_step()
+          yield tuple(path) # type: ignore
+          for step2 in path:
+            self.apply_step(step2)
+        if self.state.left > 0:
+          key = self.zobrist()
+          if key not in expanded:
+            expanded.add(key)
+            yield from expand()
+        path.pop()
+        self.undo_step()
+
+    yield from expand()
+
+  def count_moves(self, discard: float = 0) -> int:
+    """
+    Count the moves unique_moves would give, without building any of them
+    """
+    expanded: set[int] = set()
+    finished: set[int] = set()
+
+    def expand():
+      for step in self.possible_steps(discard):
+        self.apply_step(step)
+        finished.add(self._hash)
+        if self.state.left > 0:
+          key = self.zobrist()
+          if key not in expanded:
+            expanded.add(key)
+            expand()
+        self.undo_step()
+
+    expand()
+    return len(finished)
+
   def random_step(self) -> Step | None:
     """
     Get a random step from the current position.
-      Includes a sanity check for an empty return value.
+      Picks uniformly with reservoir sampling, so the steps are never gathered into a list.
+      Returns None if there are no possible steps.
     """
-    steps = list(self.possible_steps())
-    if len(steps) == 0:
-      return None
-    return random.choice(steps)
+    chosen = None
+    count = 0
+    rand = random.random
+    for step in self.possible_steps():
+      count += 1
+      # Keep the nth step with chance 1/n, so every step ends up chosen with chance 1/count
+      if rand() * count < 1:
+        chosen = step
+    return chosen
 
   def random_move(self) -> Move:
     """
@@ -658,6 +1006,7 @@ class Board:
         `random.choice(list(board.possible_moves()))`
         because it doesn't need to gather a list of all possible moves,
         which can be upwards of 300k moves long.
+      The steps are played to find the next ones, then taken back with the history.
     """
     if self.state.left == 0:
       raise StateException("Current player is out of steps, no possible moves")
@@ -665,14 +1014,14 @@ class Board:
     steps = random.randint(1, self.state.left + 3)
     steps = min(steps, self.state.left)
     move = []
-    boardState = self.encode()
     for _ in range(steps):
       step = self.random_step()
       if step == None:
         break
       move.append(step)
-      self.do_step(step)
-    self.decode(boardState)
+      self.apply_step(step)
+    for _ in move:
+      self.undo_step()
     return tuple(move)
   
   def undo(self):
@@ -684,6 +1033,9 @@ class Board:
   def undo_move(self):
     self.history.undo_move(self)
 
+  def undo_turn(self):
+    self.history.undo_turn(self)
+
   def print(self):
     """
     Print the board, including current state
@@ -708,15 +1060,8 @@ class Board:
     """
     Encode the board into a string representation
     """
-    def stringify():
-      for pos in all_positions():
-        piece = self[pos]
-        if piece != None:
-          yield piece_to_char(piece)
-        else:
-          yield "."
-
-    return self.state.encode() + " " +  "".join(stringify())
+    data = self._data
+    return self.state.encode() + " " + "".join([piece_to_char(data[sq]) for sq in ENCODE_ORDER]) # type: ignore
 
   def decode(self, val: str):
     """
@@ -726,14 +1071,40 @@ class Board:
     self.state.decode(s)
     self.history.clear()
 
-    i = 0
-    for pos in all_positions():
+    for i, sq in enumerate(ENCODE_ORDER):
       c = b[i]
       if c == ".":
-        self[pos] = None
+        self._set(sq, None)
       else:
-        self[pos] = char_to_piece(c)
-      i += 1
+        self._set(sq, char_to_piece(c))
+
+  def snapshot(self) -> bytes:
+    """
+    Pack the board into 33 bytes, one nibble per square followed by the state
+      Much smaller and faster than encode, meant for storing positions during a search
+    """
+    data = self._data
+    packed = bytearray(33)
+    for i in range(32):
+      packed[i] = (_PIECE_NIBBLES[data[2 * i]] << 4) | _PIECE_NIBBLES[data[2 * i + 1]]
+    packed[32] = self.state.pack()
+    return bytes(packed)
+
+  def restore(self, snapshot: bytes):
+    """
+    Update the board in place with the data from Board.snapshot
+      Only the squares that differ are changed, and the history is left alone
+    """
+    data = self._data
+    for i in range(32):
+      byte = snapshot[i]
+      piece = _NIBBLE_PIECES[byte >> 4]
+      if data[2 * i] != piece:
+        self._set(2 * i, piece)
+      piece = _NIBBLE_PIECES[byte & 15]
+      if data[2 * i + 1] != piece:
+        self._set(2 * i + 1, piece)
+    self.state.unpack(snapshot[32])
 
   def parse_step(self, val: str, push: str | None):
     """
@@ -770,36 +1141,20 @@ class Board:
     opNewPos = None
     if push != None:
       opOldPos, opNewPos = parse_part(push)
-    step = Step()
-    step.oldPos = oldPos
-    step.newPos = newPos
-    step.opOldPos = opOldPos
-    step.opNewPos = opNewPos
-    return step
+    return Step.find(oldPos, newPos, opOldPos, opNewPos)
   
-  def step_str(self, step: Step) -> tuple[str, str | None]:
+  def step_str(self, step: Step | int) -> tuple[str, str | None]:
     """
-    Turn a step into a string, and maybe a push string as well
+    Turn a step, or its id, into a string, and maybe a push string as well
     """
     def part_str(oldPos: Pos, newPos: Pos):
       char = piece_to_char(self[oldPos]) # type: ignore
       x, y = oldPos
-      pos = chr(x + 97) + str(8 - y)
-      dir = None
       xn, yn = newPos
-      dx = x - xn
-      dy = y - yn
-      if dx == 1:
-        dir = "e"
-      elif dx == -1:
-        dir = "w"
-      elif dy == 1:
-        dir = "s"
-      elif dy == -1:
-        dir = "n"
-      else:
+      if (xn - x, yn - y) not in DIRECTIONS:
         raise ValueError("Invalid move direction")
-      return char + pos + dir
+      return char + pos_str(oldPos) + DirectionChars[DIRECTIONS.index((xn - x, yn - y))]
+    step = as_step(step)
     push = None
     if step.opOldPos != None and step.opNewPos != None:
       push = part_str(step.opOldPos, step.opNewPos)
@@ -822,6 +1177,56 @@ class Board:
     
     return tuple(steps)
 
+# The nibble that stores each piece in Board.snapshot, 0 is an empty square
+_PIECE_NIBBLES: dict[Piece | None, int] = {None: 0}
+_NIBBLE_PIECES: list[Piece | None] = [None] * 16
+for _color in (COLORS.GOLD, COLORS.SILVER):
+  for _rank in range(6):
+    _PIECE_NIBBLES[make_piece(_color, _rank)] = make_piece(_color, _rank) + 1
+    _NIBBLE_PIECES[make_piece(_color, _rank) + 1] = make_piece(_color, _rank)
+
+def snapshot_state(snapshot: bytes) -> State:
+  """
+  Read the state from a Board.snapshot without restoring the whole board
+  """
+  state = State()
+  state.unpack(snapshot[-1])
+  return state
+
+def snapshot_pieces(snapshot: bytes) -> list[Piece | None]:
+  """
+  Read the pieces on each square from a Board.snapshot without needing a board
+  """
+  data: list[Piece | None] = [None] * 64
+  for i in range(32):
+    byte = snapshot[i]
+    data[2 * i] = _NIBBLE_PIECES[byte >> 4]
+    data[2 * i + 1] = _NIBBLE_PIECES[byte & 15]
+  return data
+
+# The board engine used by new_board, either "list" or "bitboard"
+# Can be picked with the ARIMAA_ENGINE environment variable or set_engine
+engine = os.environ.get("ARIMAA_ENGINE", "list")
+
+def set_engine(name: str):
+  """
+  Select the board engine that new_board creates
+  """
+  global engine
+  if name not in ("list", "bitboard"):
+    raise ValueError("Unknown board engine: " + name)
+  engine = name
+
+def new_board() -> Board:
+  """
+  Create an empty board using the selected engine
+  """
+  if engine == "bitboard":
+    # Imported here because the bitboard engine builds on this module
+    from bitboard import BitBoard
+    return BitBoard()
+  return Board()
+
 def parse_initial(strs: list[str]):
   """
   Parse an initial placement, which is basically a move list without the directions
@@ -1,5 +1,5 @@
 import time
-from board import Board, COLORS, Step, Move, RANKS, StateException
+from board import Board, COLORS, Step, Move, RANKS, StateException, new_board
 
 class StatsBase:
   """
@@ -45,7 +45,7 @@ class PlayerBase:
       self.name += "(" + ", ".join(args) + ")"
     else:
       self.name += "()"
-    self.board = Board()
+    self.board = new_board()
     self.stats = self.__class__.statsType(self.name, self.__class__.name)
 
   def choose_step(self) -> Step | None:
@@ -102,7 +102,7 @@ class Game:
     player1.color = COLORS.GOLD
     player2.color = COLORS.SILVER
     self.players = [player1, player2]
-    self.board = Board()
+    self.board = new_board()
 
   def setup(self):
     """
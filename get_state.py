@@ -13,6 +13,6 @@ board.place_initial(COLORS.GOLD, initial)
 board.place_initial(COLORS.SILVER, initial)
 
 for _ in range(randint(30, 45)):
-  board.do_move(board.random_move())
+  board.apply_move(board.random_move())
 
 print(board.encode())
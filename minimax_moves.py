@@ -14,8 +14,10 @@ def minimax(board: Board, depth: int, player: int, subset: float = 1) -> Move:
   bestValue = -inf
   bestMove = None
   num = 1
-  for move in board.possible_moves(1 - subset):
+  for move in board.unique_moves(1 - subset):
+    board.apply_move(move)
     value = minimax_internal(board, depth - 1, player, subset, inf, -inf)
+    board.undo_move()
     num += 1
     if value > bestValue or (value == bestValue and chance(1 / num)):
       bestValue = value
@@ -32,8 +34,10 @@ def minimax_internal(board: Board, depth: int, player: int, subset: float, alpha
   
   bestValue = -inf
 
-  for move in board.possible_moves(1 - subset):
+  for move in board.unique_moves(1 - subset):
+    board.apply_move(move)
     value = -minimax_internal(board, depth - 1, player, subset, -beta, -alpha)
+    board.undo_move()
 
     if bestValue < value:
       bestValue = value
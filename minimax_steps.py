@@ -8,7 +8,7 @@ def minimax(board: Board, depth: int, player: int, subset: float = 1):
   bestStep = None
 
   for step in board.possible_steps(1 - subset):
-    board.do_step(step)
+    board.apply_step(step)
     value = minimax_internal(board, depth - 1, player, subset, inf, -inf)
     if value > bestValue:
       bestValue = value
@@ -38,10 +38,10 @@ def minimax_internal(board: Board, depth: int, player: int, subset: float, alpha
       alpha = value
       if alpha >= beta:
         return bestValue
-    board.undo()
+    board.undo_turn()
 
   for step in board.possible_steps(1 - subset):
-    board.do_step(step)
+    board.apply_step(step)
     value = minimax_internal(board, depth - 1, player, subset, alpha, beta)
 
     if bestValue < value:
@@ -0,0 +1,133 @@
+import sys
+import time
+from board import Board, new_board
+
+# Positions to check move generation on, in Board.encode format
+# Covers the opening, midgames with pushes, pulls and captures, a turn with steps already taken,
+# and a rabbit one step from the goal
+POSITIONS = [
+  ".,0,4 hr....RHcr....RCdr....RDmr....RMer....REdr....RDcr....RChr....RH",
+  ".,0,4 .h.rrH...rR....Dd.R...C.....m.R..errR.DCd........c.r....hrr.R..H",
+  ".,1,4 .hcrRH....Rr.rRC.d.........r...Dme.rr.E.....R..Dcrd....Ch.r..H..",
+  ".,0,3 h....r.Hdc.RRRED....RC....rr...M.e.....Ddm.R....c.r...C.h.r.HR..",
+  ".,1,4 hR.....Hcm..rR..dhr.rR.C.d...D.E..eR......r.RR..c....R.D...R..CH",
+]
+
+# The number of leaf nodes at step depths 1, 2 and 3 for each position, and the number of distinct moves,
+# worked out with the original list engine
+EXPECTED = [
+  ([8, 102, 1432], 2467),
+  ([23, 558, 13424], 12077),
+  ([27, 780, 22381], 26967),
+  ([27, 743, 20343], 3718),
+  ([25, 630, 13735], 8570),
+]
+
+def perft(board: Board, depth: int) -> int:
+  """
+  Count the positions reachable in exactly depth steps, where ending the turn early also counts as a step
+    This walks the same tree as BaseMCTSPlayer.expand
+  """
+  if depth == 0:
+    return 1
+  if board.state.end:
+    return 0
+  nodes = 0
+  # If this is not the first step of the turn, the player can end their turn here
+  if board.state.left != 4:
+    board.finish_turn()
+    nodes += perft(board, depth - 1)
+    board.undo_turn()
+  for step in board.possible_steps():
+    board.apply_step(step)
+    if board.state.left == 0:
+      board.finish_turn()
+    nodes += perft(board, depth - 1)
+    board.undo_step()
+  return nodes
+
+def divide(board: Board, depth: int) -> dict[str, int]:
+  """
+  Split the perft count by the first step, to find which step a bug is under
+  """
+  counts: dict[str, int] = dict()
+  if board.state.left != 4:
+    board.finish_turn()
+    counts["pass"] = perft(board, depth - 1)
+    board.undo_turn()
+  for step in board.possible_steps():
+    name = " ".join([part for part in board.step_str(step) if part != None])
+    board.apply_step(step)
+    if board.state.left == 0:
+      board.finish_turn()
+    counts[name] = perft(board, depth - 1)
+    board.undo_step()
+  return counts
+
+def load(boardState: str) -> Board:
+  board = new_board()
+  board.decode(boardState)
+  return board
+
+def check(args: list[str]):
+  """
+  Run perft on every reference position up to the given depth (default 3) and compare with the expected counts
+  """
+  maxDepth = int(args[0]) if len(args) > 0 else 3
+  failed = 0
+  totalNodes = 0
+  totalTime = 0
+  for i in range(len(POSITIONS)):
+    board = load(POSITIONS[i])
+    expectedNodes, expectedMoves = EXPECTED[i]
+    print(POSITIONS[i])
+    for depth in range(1, maxDepth + 1):
+      start = time.perf_counter()
+      nodes = perft(board, depth)
+      elapsed = time.perf_counter() - start
+      totalNodes += nodes
+      totalTime += elapsed
+      result = ""
+      if depth <= len(expectedNodes):
+        result = "ok" if nodes == expectedNodes[depth - 1] else f"FAIL, expected {expectedNodes[depth - 1]}"
+        failed += nodes != expectedNodes[depth - 1]
+      print(f"\tdepth {depth}: {nodes} nodes in {elapsed:.3f}s ({nodes / max(elapsed, 1e-9):.0f} nodes/s) {result}")
+    start = time.perf_counter()
+    moves = board.count_moves()
+    elapsed = time.perf_counter() - start
+    result = "ok" if moves == expectedMoves else f"FAIL, expected {expectedMoves}"
+    failed += moves != expectedMoves
+    print(f"\t{moves} distinct moves in {elapsed:.3f}s {result}")
+    if board.encode() != POSITIONS[i]:
+      print("\tFAIL, the board was not restored")
+      failed += 1
+  print(f"{totalNodes} nodes in {totalTime:.3f}s ({totalNodes / max(totalTime, 1e-9):.0f} nodes/s)")
+  return "All counts match" if failed == 0 else f"{failed} counts did not match"
+
+def split(args: list[str]):
+  """
+  Print the divide counts of a position (given by index or Board.encode string) at a depth
+  """
+  position, depth = args[0], int(args[1])
+  if position.isdigit():
+    position = POSITIONS[int(position)]
+  counts = divide(load(position), depth)
+  for name, count in counts.items():
+    print(f"{name}: {count}")
+  return f"{sum(counts.values())} nodes"
+
+def bench(args: list[str]):
+  """
+  Time perft on the opening position at a depth (default 4)
+  """
+  depth = int(args[0]) if len(args) > 0 else 4
+  board = load(POSITIONS[0])
+  start = time.perf_counter()
+  nodes = perft(board, depth)
+  elapsed = time.perf_counter() - start
+  return f"{nodes} nodes in {elapsed:.3f}s ({nodes / elapsed:.0f} nodes/s)"
+
+if __name__ == "__main__":
+  # Usage: python perft.py check [depth] | split <position> <depth> | bench [depth]
+  # The board engine is picked with the ARIMAA_ENGINE environment variable
+  print(eval(sys.argv[1])(sys.argv[2:]))
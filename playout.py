@@ -0,0 +1,333 @@
+import math
+import random
+from typing import Any, Generator
+
+from board import Piece, Step, Move, COLORS, RANKS, NEIGHBORS, STEP_TABLE, RABBIT_STEP_TABLE, \
+  snapshot_pieces, snapshot_state, make_piece, TRAP_SQUARES
+
+# The squares each color's rabbits need to reach
+GOAL_SQUARES = [range(0, 8), range(56, 64)]
+# The rabbit of each color
+RABBITS = [make_piece(COLORS.GOLD, RANKS.RABBIT), make_piece(COLORS.SILVER, RANKS.RABBIT)]
+# How much each piece is worth for EvalPlayout, in the order of RANKS
+PIECE_VALUES = [1, 2, 3, 5, 8, 13]
+ADVANCE_VALUE = 0.1 # How much each row a rabbit has moved towards its goal is worth
+TRAP_VALUE = 0.5 # How much having more pieces next to a trap than the opponent is worth
+EVAL_SCALE = 4 # The score lead that gives a 73% chance of winning
+
+def rabbit_advance(color: int, sq: int) -> int:
+  """
+  How many rows a rabbit on a square has moved from its color's back row
+  """
+  return 7 - (sq >> 3) if color == COLORS.GOLD else sq >> 3
+
+class Playout:
+  """
+  A stripped down board that only plays random games to the end, used for MCTS simulations
+    Follows the same rules as Board, and picks moves the same way as Board.random_move,
+    but keeps no history or Zobrist key and never checks the steps it makes
+  """
+  data: list[Piece | None] # The piece on each square
+  pieces: list[set[int]] # The squares of each color's pieces
+  rabbits: list[int] # The number of rabbits each color has
+  player: int # Whose turn it is, or the winner if the game is over
+  left: int # How many steps are left in the current player's turn
+  end: bool # If the game is over
+
+  def __init__(self) -> None:
+    self.data = [None] * 64
+    self.pieces = [set(), set()]
+    self.rabbits = [0, 0]
+    self.player = COLORS.GOLD
+    self.left = 4
+    self.end = False
+
+  def load(self, snapshot: bytes):
+    """
+    Set up the position from a Board.snapshot
+    """
+    data = snapshot_pieces(snapshot)
+    self.data = data
+    self.pieces = [set(), set()]
+    self.rabbits = [0, 0]
+    for sq in range(64):
+      piece = data[sq]
+      if piece != None:
+        self.pieces[piece >> 3].add(sq)
+        if piece & 7 == RANKS.RABBIT:
+          self.rabbits[piece >> 3] += 1
+    state = snapshot_state(snapshot)
+    self.player = state.player
+    self.left = state.left
+    self.end = state.end
+
+  def play(self, snapshot: bytes) -> int:
+    """
+    Play a random game from a Board.snapshot to the end, and return the winner
+    """
+    self.load(snapshot)
+    while not self.end:
+      self.random_move()
+      self.finish_turn()
+    return self.player
+
+  def _is_frozen(self, sq: int) -> bool:
+    """
+    Check if the piece on a square is frozen
+    """
+    data = self.data
+    piece: int = data[sq] # type: ignore
+    color = piece >> 3
+    rank = piece & 7
+    frozen = False
+    for sq2 in NEIGHBORS[sq]:
+      other = data[sq2]
+      if other != None:
+        if other >> 3 == color:
+          return False
+        if (other & 7) > rank:
+          frozen = True
+    return frozen
+
+  def possible_steps(self) -> Generator[Step, Any, None]:
+    """
+    Obtain all possible steps for the current player, in the same way as Board.possible_steps
+    """
+    left = self.left
+    if left < 1:
+      return
+    data = self.data
+    player = self.player
+    for sq in tuple(self.pieces[player]):
+      if self._is_frozen(sq):
+        continue
+      rank = data[sq] & 7 # type: ignore
+      table = RABBIT_STEP_TABLE[player][sq] if rank == RANKS.RABBIT else STEP_TABLE[sq]
+      for sq2, step, pushes, pulls in table:
+        enemy = data[sq2]
+        if enemy == None:
+          yield step
+        elif left > 1 and enemy >> 3 != player and rank > (enemy & 7):
+          for sq3, push in pushes:
+            if data[sq3] == None:
+              yield push
+          for sq3, pull in pulls:
+            if data[sq3] == None:
+              yield pull
+
+  def random_step(self) -> Step | None:
+    """
+    Pick a uniformly random step with reservoir sampling, or None if there are none
+      The same walk as possible_steps, written out so no generator is needed
+    """
+    left = self.left
+    if left < 1:
+      return None
+    data = self.data
+    player = self.player
+    rand = random.random
+    chosen = None
+    count = 0
+    for sq in self.pieces[player]:
+      rank = data[sq] & 7 # type: ignore
+      # Inlined _is_frozen
+      frozen = False
+      for sq2 in NEIGHBORS[sq]:
+        other = data[sq2]
+        if other != None:
+          if other >> 3 == player:
+            frozen = False
+            break
+          if (other & 7) > rank:
+            frozen = True
+      if frozen:
+        continue
+      table = RABBIT_STEP_TABLE[player][sq] if rank == RANKS.RABBIT else STEP_TABLE[sq]
+      for sq2, step, pushes, pulls in table:
+        enemy = data[sq2]
+        if enemy == None:
+          count += 1
+          # Keep the nth step with chance 1/n, so every step ends up chosen with chance 1/count
+          if rand() * count < 1:
+            chosen = step
+        elif left > 1 and enemy >> 3 != player and rank > (enemy & 7):
+          for sq3, push in pushes:
+            if data[sq3] == None:
+              count += 1
+              if rand() * count < 1:
+                chosen = push
+          for sq3, pull in pulls:
+            if data[sq3] == None:
+              count += 1
+              if rand() * count < 1:
+                chosen = pull
+    return chosen
+
+  def random_move(self) -> Move:
+    """
+    Make a random move, with the same bias towards using more steps as Board.random_move
+    """
+    steps = random.randint(1, self.left + 3)
+    steps = min(steps, self.left)
+    move = []
+    for _ in range(steps):
+      step = self.random_step()
+      if step == None:
+        break
+      move.append(step)
+      self.apply_step(step)
+    return tuple(move) # type: ignore
+
+  def apply_step(self, step: Step):
+    """
+    Execute a step that possible_steps gave, then remove any pieces left alone on a trap next to it
+    """
+    data = self.data
+    toMove = data[step.oldSq]
+    mine = self.pieces[toMove >> 3] # type: ignore
+    data[step.oldSq] = None
+    mine.discard(step.oldSq)
+    if step.opOldSq == -1:
+      self.left -= 1
+    else:
+      enemy = data[step.opOldSq]
+      theirs = self.pieces[enemy >> 3] # type: ignore
+      data[step.opOldSq] = None
+      theirs.discard(step.opOldSq)
+      data[step.opNewSq] = enemy
+      theirs.add(step.opNewSq)
+      self.left -= 2
+    data[step.newSq] = toMove
+    mine.add(step.newSq)
+
+    for trap in step.traps:
+      piece = data[trap]
+      if piece != None:
+        color = piece >> 3
+        for sq in NEIGHBORS[trap]:
+          friend = data[sq]
+          if friend != None and friend >> 3 == color:
+            break
+        else:
+          data[trap] = None
+          self.pieces[color].discard(trap)
+          if piece & 7 == RANKS.RABBIT:
+            self.rabbits[color] -= 1
+
+  def finish_turn(self):
+    """
+    Start the next player's turn, ending the game if someone won, in the same way as Board.finish_turn
+    """
+    self.player = 1 - self.player
+    self.left = 4
+    win = self._check_win()
+    if win != None:
+      self.end = True
+      self.player = win
+
+  def _check_win(self) -> int | None:
+    """
+    Check if a player has won the game, in the same order as Board._check_win
+    """
+    playerA = 1 - self.player
+    playerB = self.player
+    data = self.data
+    for color in (playerA, playerB):
+      for sq in GOAL_SQUARES[color]:
+        if data[sq] == RABBITS[color]:
+          return color
+    if self.rabbits[playerB] == 0:
+      return playerA
+    if self.rabbits[playerA] == 0:
+      return playerB
+    # The player who's turn it is loses if they cannot move
+    for _ in self.possible_steps():
+      return None
+    return playerA
+
+class EvalPlayout(Playout):
+  """
+  A playout that can stop after some turns and guess the winner with a static evaluation
+    The material and rabbit advancement of each color are kept up to date as the steps are made,
+    and trap control is counted when the evaluation is needed
+  """
+  material: list[int] # The total value of each color's pieces
+  advance: list[int] # The total rows each color's rabbits have moved forward
+
+  def __init__(self) -> None:
+    super().__init__()
+    self.material = [0, 0]
+    self.advance = [0, 0]
+
+  def load(self, snapshot: bytes):
+    super().load(snapshot)
+    self.material = [0, 0]
+    self.advance = [0, 0]
+    for color in (COLORS.GOLD, COLORS.SILVER):
+      for sq in self.pieces[color]:
+        rank = self.data[sq] & 7 # type: ignore
+        self.material[color] += PIECE_VALUES[rank]
+        if rank == RANKS.RABBIT:
+          self.advance[color] += rabbit_advance(color, sq)
+
+  def play_eval(self, snapshot: bytes, color: int, turns: int) -> float:
+    """
+    Play a random game from a Board.snapshot for at most a number of turns,
+      and return the chance that a color wins, which is 1 or 0 if the game ended
+    """
+    self.load(snapshot)
+    for _ in range(turns):
+      if self.end:
+        break
+      self.random_move()
+      self.finish_turn()
+    if self.end:
+      return 1 if self.player == color else 0
+    return 1 / (1 + math.exp(-self.score(color) / EVAL_SCALE))
+
+  def score(self, color: int) -> float:
+    """
+    The static evaluation of the position for a color, positive if it is ahead
+    """
+    other = 1 - color
+    score: float = self.material[color] - self.material[other]
+    score += ADVANCE_VALUE * (self.advance[color] - self.advance[other])
+    data = self.data
+    for trap in TRAP_SQUARES:
+      count = 0
+      for sq in NEIGHBORS[trap]:
+        piece = data[sq]
+        if piece != None:
+          count += 1 if piece >> 3 == color else -1
+      if count > 0:
+        score += TRAP_VALUE
+      elif count < 0:
+        score -= TRAP_VALUE
+    return score
+
+  def apply_step(self, step: Step):
+    data = self.data
+    toMove: int = data[step.oldSq] # type: ignore
+    enemy = data[step.opOldSq] if step.opOldSq != -1 else None
+    # What will be on each trap once the pieces have moved, before any are removed
+    onTraps = []
+    for trap in step.traps:
+      if trap == step.newSq:
+        onTraps.append((trap, toMove))
+      elif trap == step.opNewSq:
+        onTraps.append((trap, enemy))
+      elif trap != step.oldSq and trap != step.opOldSq:
+        onTraps.append((trap, data[trap]))
+    super().apply_step(step)
+    if toMove & 7 == RANKS.RABBIT:
+      color = toMove >> 3
+      self.advance[color] += rabbit_advance(color, step.newSq) - rabbit_advance(color, step.oldSq)
+    if enemy != None and enemy & 7 == RANKS.RABBIT:
+      color = enemy >> 3
+      self.advance[color] += rabbit_advance(color, step.opNewSq) - rabbit_advance(color, step.opOldSq)
+    for trap, piece in onTraps:
+      if piece != None and data[trap] == None:
+        color = piece >> 3
+        self.material[color] -= PIECE_VALUES[piece & 7]
+        if piece & 7 == RANKS.RABBIT:
+          self.advance[color] -= rabbit_advance(color, trap)
@@ -0,0 +1,59 @@
+import time
+from board import Board, STEPS
+from batchboard import BatchBoard, STEP_GROUPS
+from bitboard import squares
+from playout import Playout
+from testBitboard import test_args, set_up
+
+# Plays random games with the batched engine and checks every step against the full board
+seed, games = test_args(20)
+start = set_up(Board())
+boards = []
+for _ in range(games):
+  board = Board()
+  board.restore(start.snapshot())
+  boards.append(board)
+batch = BatchBoard()
+batch.load([board.snapshot() for board in boards])
+steps = 0
+while len(batch.games) > 0:
+  playing = list(batch.games)
+  finishing = set(batch.games[batch.budget == 0])
+  legal = batch.legal_steps()
+  for column, i in enumerate(playing):
+    if i not in finishing:
+      found = set()
+      for group, mask in enumerate(legal[:, column]):
+        dir, kind, opDir = STEP_GROUPS[group]
+        for sq in squares(int(mask)):
+          found.add(STEPS[sq | dir << 6 | kind << 8 | opDir << 10])
+      if found != set(boards[i].possible_steps()):
+        raise AssertionError("Steps differ in " + boards[i].encode())
+  chosen = batch.step()
+  for i in playing:
+    board = boards[i]
+    if i in finishing:
+      board.finish_turn()
+    if chosen[i] != -1:
+      # The full board checks that every step is legal
+      board.do_step(STEPS[chosen[i]]) # type: ignore
+      steps += 1
+    if batch.winners[i] != -1:
+      if not board.state.end or board.state.player != batch.winners[i]:
+        raise AssertionError("Winners differ in " + board.encode())
+    elif board.snapshot() != batch.snapshot(i):
+      raise AssertionError("Positions differ in " + board.encode())
+print(f"{games} games, {steps} steps, engines agree")
+
+# Time the batches against one game at a time
+playout = Playout()
+for size in (1, 64, 256, 1024, 4096):
+  count = 0
+  startTime = time.perf_counter()
+  while time.perf_counter() - startTime < 3:
+    if size == 1:
+      playout.play(start.snapshot())
+    else:
+      batch.play([start.snapshot()] * size)
+    count += size
+  print(f"{'playout' if size == 1 else 'batch of ' + str(size)}: {count / (time.perf_counter() - startTime):.1f} playouts/s")
@@ -0,0 +1,85 @@
+import random
+import sys
+from board import Board, RANKS, COLORS, Step
+from bitboard import BitBoard
+
+# The setup every test game starts with, shared with testPlayout.py and testBatchBoard.py
+initial = [
+      [RANKS.RABBIT, RANKS.RABBIT, RANKS.RABBIT, RANKS.RABBIT,
+        RANKS.RABBIT, RANKS.RABBIT, RANKS.RABBIT, RANKS.RABBIT],
+      [RANKS.HORSE, RANKS.CAT, RANKS.DOG, RANKS.CAMEL,
+        RANKS.ELEPHANT, RANKS.DOG, RANKS.CAT, RANKS.HORSE]
+    ]
+
+def test_args(games: int) -> tuple[int, int]:
+  """
+  Read the seed and number of games from the command line, and seed random with it
+    Usage: python <test>.py [seed] [games]
+  """
+  seed = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+  games = int(sys.argv[2]) if len(sys.argv) > 2 else games
+  random.seed(seed)
+  return seed, games
+
+def set_up(board: Board) -> Board:
+  """
+  Place the starting pieces of both colors on an empty board
+  """
+  board.place_initial(COLORS.GOLD, initial)
+  board.place_initial(COLORS.SILVER, initial)
+  return board
+
+def step_key(step: Step):
+  return (step.oldPos, step.newPos, step.opOldPos, step.opNewPos)
+
+def check(listBoard: Board, bitBoard: Board):
+  boardState = listBoard.encode()
+  if bitBoard.encode() != boardState:
+    raise AssertionError("Boards differ: " + boardState + " vs " + bitBoard.encode())
+  # The incremental Zobrist key must match one built from scratch
+  fresh = Board()
+  fresh.decode(boardState)
+  key = fresh.zobrist()
+  if listBoard.zobrist() != key or bitBoard.zobrist() != key:
+    raise AssertionError("Zobrist key differs in " + boardState)
+  for x in range(8):
+    for y in range(8):
+      if listBoard[x, y] != None and listBoard.is_frozen((x, y)) != bitBoard.is_frozen((x, y)): # type: ignore
+        raise AssertionError("Frozen differs at " + str((x, y)) + " in " + boardState)
+  steps = {step_key(step): step for step in listBoard.possible_steps()}
+  if set(steps) != {step_key(step) for step in bitBoard.possible_steps()}:
+    raise AssertionError("Steps differ in " + boardState)
+  # Every step must have the same result, and undo back to the same position
+  # The list engine checks the steps, the bitboard engine trusts them
+  for step in steps.values():
+    results = []
+    for board in (listBoard, bitBoard):
+      if board is listBoard:
+        board.do_step(step)
+      else:
+        board.apply_step(step)
+      if board.state.left == 0:
+        board.finish_turn()
+      results.append((board.encode(), board.zobrist()))
+      board.undo_step()
+      if board.encode() != boardState or board.zobrist() != key:
+        raise AssertionError("Undo failed for " + board.__class__.__name__ + " in " + boardState)
+    if results[0] != results[1]:
+      raise AssertionError("Step results differ in " + boardState)
+
+if __name__ == "__main__":
+  # Plays random games and checks that the bitboard engine agrees with the list engine at every step
+  seed, games = test_args(10)
+  turns = 0
+  for game in range(games):
+    listBoard = set_up(Board())
+    bitBoard = set_up(BitBoard())
+    while not listBoard.state.end:
+      check(listBoard, bitBoard)
+      move = listBoard.random_move()
+      listBoard.do_move(move)
+      bitBoard.do_move(move)
+      turns += 1
+    if bitBoard.encode() != listBoard.encode():
+      raise AssertionError("Game results differ")
+  print(f"{games} games, {turns} turns, engines agree")
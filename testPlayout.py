@@ -0,0 +1,41 @@
+import time
+from board import Board
+from playout import Playout
+from testBitboard import test_args, set_up
+
+# Plays random games with the playout engine and checks every move against the full board
+seed, games = test_args(10)
+start = set_up(Board())
+turns = 0
+playout = Playout()
+for game in range(games):
+  board = Board()
+  board.restore(start.snapshot())
+  playout.load(board.snapshot())
+  while not playout.end:
+    if set(playout.possible_steps()) != set(board.possible_steps()):
+      raise AssertionError("Steps differ in " + board.encode())
+    move = playout.random_move()
+    playout.finish_turn()
+    # The full board checks that every step is legal
+    board.do_move(move)
+    turns += 1
+    if board._data != playout.data or board.state.end != playout.end or board.state.player != playout.player:
+      raise AssertionError("Positions differ after " + board.move_str(move) + " in " + board.encode())
+print(f"{games} games, {turns} turns, engines agree")
+
+# Time the playouts against the board's random games
+board = Board()
+for name in ("board", "playout"):
+  count = 0
+  startTime = time.perf_counter()
+  while time.perf_counter() - startTime < 2:
+    if name == "board":
+      board.restore(start.snapshot())
+      board.history.clear()
+      while not board.state.end:
+        board.apply_move(board.random_move())
+    else:
+      playout.play(start.snapshot())
+    count += 1
+  print(f"{name}: {count / (time.perf_counter() - startTime):.1f} playouts/s")